@@ -1,5 +1,10 @@
+import asyncio
+import csv
+import io
 import ipaddress
+import json
 import logging
+import math
 import os
 import platform as _platform
 # أضف هذه المكتبات لعمل Jitter و Bandwidth
@@ -13,15 +18,12 @@ import re as _re
 import subprocess
 import sys
 import time
-import datetime  # أضف هذا السطر في أعلى الملف مع الاستيرادات الأخرى
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
-from db import _conn 
 from pathlib import Path
-from typing import Dict, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import FastAPI, Header, Request
+from fastapi import FastAPI, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
@@ -81,7 +83,10 @@ logger.info("=" * 60)
 
 try:
     logger.info("Importing db...")
-    from db import Database
+    from db import Database, close_connections, status_writer
+
+    logger.info("Importing scheduler...")
+    from scheduler import PeriodicJob
 
     logger.info("Importing auth...")
     from auth import (
@@ -94,9 +99,12 @@ try:
     logger.info("Importing security...")
     from security import hash_password
 
+    logger.info("Importing ICMP engine...")
+    import icmp
+
     logger.info("Importing network scanner...")
     # Import scanner mainly for utility if needed, but we will use direct ping for refresh
-    from network_scanner import SubnetScanner
+    from network_scanner import SubnetScanner, host_range, shutdown_process_pool
 
     logger.info("✓ All imports successful")
 except Exception as e:
@@ -213,6 +221,30 @@ class AdvancedScanRequest(BaseModel):
     subnet: str
     timeout: int = 2
 
+
+LATENCY_ROLLUP_INTERVAL = int(os.environ.get('LATENCY_ROLLUP_INTERVAL', '60'))
+HISTORY_ARCHIVE_INTERVAL = int(os.environ.get('HISTORY_ARCHIVE_INTERVAL', '3600'))
+PROBE_WORKERS = int(os.environ.get('PROBE_WORKERS', '32'))
+
+# Subprocess pings when in-process ICMP is not permitted
+probe_executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="probe")
+
+# Keeps per-subnet RTT estimates between advanced scans
+subnet_scanner = SubnetScanner()
+# Reachability checks queued by endpoints that return before they finish
+background_probes = set()
+
+
+def _latency_maintenance():
+    Database.rollup_latency()
+    Database.prune_latency_samples()
+
+
+background_jobs = [
+    PeriodicJob("latency-rollup", LATENCY_ROLLUP_INTERVAL, _latency_maintenance),
+    PeriodicJob("history-archive", HISTORY_ARCHIVE_INTERVAL, Database.archive_history),
+]
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("=" * 60)
@@ -224,15 +256,35 @@ async def startup_event():
 
         Database.create_admin_if_not_exists()
         logger.info("✓ Default admin user ensured")
+
+        status_writer.start()
+        for job in background_jobs:
+            job.start()
     except Exception as e:
         logger.error(f"Startup error: {e}", exc_info=True)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    for job in background_jobs:
+        job.stop()
+    probe_executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_process_pool()
+    status_writer.stop()
+    close_connections()
+    logger.info("✓ Database connections closed")
+
+
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/health/status-writer")
+async def status_writer_health():
+    return {"success": True, "data": status_writer.stats()}
+
+
 @app.post("/api/auth/login")
 async def login(req: LoginRequest):
     logger.info(f"LOGIN ATTEMPT: {req.username}")
@@ -343,19 +395,22 @@ async def get_current_user(authorization: str = Header(None)):
 # --- Device Endpoints ---
 
 @app.get("/api/devices")
-async def get_devices(skip: int = 0, limit: int = 50):
+async def get_devices(skip: int = Query(0, ge=0), limit: int = Query(50, ge=1), status: Optional[str] = None, subnet: Optional[str] = None,
+                      device_type: Optional[str] = None, sort: str = '-created_at', cursor: Optional[str] = None):
     logger.info("GET /api/devices")
     try:
-        devices = Database.get_devices()
-        total = len(devices)
-        paginated = devices[skip:skip + limit]
-        paginated = _sanitize_for_json(paginated)
+        try:
+            page = Database.get_devices_page(limit=limit, offset=skip, status=status, subnet=subnet,
+                                             device_type=device_type, sort=sort, cursor=cursor)
+        except ValueError as e:
+            return {"success": False, "message": str(e), "data": []}
         return {
             "success": True,
-            "data": paginated,
-            "total": total,
+            "data": _sanitize_for_json(page["data"]),
+            "total": page["total"],
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": page["next_cursor"]
         }
     except Exception as e:
         logger.error(f"Get devices error: {e}", exc_info=True)
@@ -374,52 +429,31 @@ async def refresh_devices_status():
         if not devices:
             return {"success": True, "message": "No devices to refresh", "data": []}
 
-        # Function to ping a single device
-        def check_single_device(device):
+        # Apply the sweep result for a single device
+        async def check_single_device(device):
             ip = device.get('ip_address')
             try:
-                if _platform.system().lower() == 'windows':
-                    cmd = ['ping', '-n', '1', '-w', '1000', ip]
-                else:
-                    cmd = ['ping', '-c', '1', '-W', '1', ip]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
+                latency = rtts.get(ip)
+                status = 'up' if ip in rtts else 'down'
                 
-                latency = None
-                status = 'down'
-                
-                if result.returncode == 0:
-                    status = 'up'
-                    out = result.stdout
-                    m = _re.search(r'time[<=](\d+\.?\d*)\s*ms', out)
-                    if m:
-                        try:
-                            latency = float(m.group(1))
-                        except Exception:
-                            pass
-                
-                # Update DB
-                Database.update_device_status(device['id'], status, latency_ms=latency)
+                # Queue DB update (written behind by the status writer)
+                await status_writer.submit_async(device['id'], status, latency)
                 logger.debug(f"Checked {ip}: {status} ({latency}ms)")
                 
-                # Fetch updated record to return
-                return Database.get_device(device['id'])
+                return device
             
             except Exception as e:
                 logger.error(f"Error checking {ip}: {e}")
                 return device
 
-        # Use ThreadPoolExecutor to speed up pings
-        updated_devices = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(check_single_device, dev): dev for dev in devices}
-            
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                    updated_devices.append(result)
-                except Exception as e:
-                    logger.error(f"Error in future: {e}")
+        # One concurrent ICMP sweep, then per-device bookkeeping
+        rtts = await _ping_many([d.get('ip_address') for d in devices])
+        for dev in devices:
+            await check_single_device(dev)
+
+        # Probe results are written behind; wait for them before reading back
+        await asyncio.to_thread(status_writer.flush)
+        updated_devices = Database.get_devices()
 
         logger.info(f"✓ Refreshed status for {len(updated_devices)} devices")
         return {
@@ -455,18 +489,7 @@ async def get_device_history(device_id: int, limit: int = 50):
         if not device:
             return {"success": False, "message": "جهاز غير موجود", "data": []}
 
-        import importlib
-        dbmod = importlib.import_module('db')
-        conn = dbmod._conn()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM device_status
-            WHERE device_id = ?
-            ORDER BY changed_at DESC
-            LIMIT ?
-        ''', (device_id, limit))
-        history = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        history = Database.get_device_history(device_id, limit)
 
         history = _sanitize_for_json(history)
         return {"success": True, "data": history}
@@ -498,28 +521,14 @@ async def create_device(req: DeviceRequest):
         
         # Initial ping
         try:
-            sysplat = _platform.system().lower()
-            if sysplat == 'windows':
-                cmd = ['ping', '-n', '1', '-w', '1000', req.ip_address]
+            rtts = await _ping_many([req.ip_address])
+            if req.ip_address in rtts:
+                device = Database.update_device_status(device['id'], 'up', latency_ms=rtts[req.ip_address]) or device
             else:
-                cmd = ['ping', '-c', '1', '-W', '1', req.ip_address]
-            p = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
-            latency = None
-            if p.returncode == 0:
-                out = p.stdout
-                m = _re.search(r'time[=<]?(\d+\.?\d*)\s*ms', out)
-                if m:
-                    try:
-                        latency = float(m.group(1))
-                    except Exception:
-                        latency = None
-                Database.update_device_status(device['id'], 'up', latency_ms=latency)
-            else:
-                Database.update_device_status(device['id'], 'unknown', latency_ms=None)
+                device = Database.update_device_status(device['id'], 'unknown', latency_ms=None) or device
         except Exception as e:
             logger.debug(f"Ping check failed for {req.ip_address}: {e}")
 
-        device = Database.get_device(device['id'])
         device = _sanitize_for_json(device)
         return {
             "success": True,
@@ -531,6 +540,132 @@ async def create_device(req: DeviceRequest):
         return {"success": False, "message": str(e)}
 
 
+def _ping_subprocess(ip: str, timeout: float = 1) -> Tuple[bool, Optional[float]]:
+    """Fork one `ping`: (answered, latency_ms). Fallback when ICMP sockets are not permitted."""
+    try:
+        if _platform.system().lower() == 'windows':
+            cmd = ['ping', '-n', '1', '-w', str(int(timeout * 1000)), ip]
+        else:
+            cmd = ['ping', '-c', '1', '-W', str(max(1, math.ceil(timeout))), ip]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout + 2)
+        if result.returncode != 0:
+            return False, None
+        m = _re.search(r'time[<=](\d+\.?\d*)\s*ms', result.stdout)
+        return True, float(m.group(1)) if m else None
+    except Exception as e:
+        logger.debug(f"Ping failed for {ip}: {e}")
+        return False, None
+
+
+async def _ping_many(ips: List[str], timeout: float = 1) -> Dict[str, Optional[float]]:
+    """Latency (ms, possibly None) for every address that answered; silent ones are left out."""
+    rtts = await icmp.ping_hosts_async(ips, timeout)
+    if rtts is not None:
+        return {ip: round(rtt, 3) for ip, rtt in rtts.items() if rtt is not None}
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(loop.run_in_executor(probe_executor, _ping_subprocess, ip, timeout) for ip in ips))
+    return {ip: latency for ip, (up, latency) in zip(ips, results) if up}
+
+
+async def _probe_devices(devices: List[Dict]):
+    """Ping devices and queue the results for the status writer"""
+    try:
+        rtts = await _ping_many([d['ip_address'] for d in devices])
+        for device in devices:
+            ip = device['ip_address']
+            await status_writer.submit_async(device['id'], 'up' if ip in rtts else 'down', rtts.get(ip))
+    except Exception as e:
+        logger.error(f"Error checking {len(devices)} devices: {e}", exc_info=True)
+
+
+def _parse_device_import(body: str, fmt: str) -> List[Tuple[int, Any]]:
+    """``(row number, row)`` pairs. NDJSON rows are numbered by line, and a
+    line that is not valid JSON comes back as its ValueError."""
+    if fmt == 'csv':
+        return list(enumerate((dict(row) for row in csv.DictReader(io.StringIO(body))), start=1))
+    rows = []
+    for number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append((number, json.loads(line)))
+        except ValueError as e:
+            rows.append((number, e))
+    return rows
+
+
+@app.post("/api/devices/import")
+async def import_devices(request: Request, format: Optional[str] = None):
+    """
+    Bulk create devices from CSV (with a header row) or NDJSON.
+    Rows need ip_address; name, device_type, mac_address and subnet are optional.
+    Malformed and invalid rows are reported per row; all valid rows are
+    inserted in one transaction. New devices are then pinged in one
+    background sweep, so the response does not wait for it.
+    """
+    logger.info("POST /api/devices/import")
+    try:
+        content_type = request.headers.get('content-type', '')
+        fmt = format or ('csv' if 'csv' in content_type else 'ndjson')
+        if fmt not in ('csv', 'ndjson'):
+            return {"success": False, "message": f"Unsupported format: {fmt}", "data": {}}
+        body = (await request.body()).decode('utf-8-sig')
+        try:
+            rows = _parse_device_import(body, fmt)
+        except (ValueError, csv.Error) as e:
+            return {"success": False, "message": f"تعذر قراءة الملف: {e}", "data": {}}
+
+        records = []
+        row_numbers = []
+        errors = []
+        for number, row in rows:
+            if isinstance(row, ValueError):
+                errors.append({"row": number, "ip_address": None, "reason": f"invalid JSON: {row}"})
+                continue
+            if not isinstance(row, dict):
+                errors.append({"row": number, "ip_address": None, "reason": "invalid row"})
+                continue
+            ip = str(row.get('ip_address') or '').strip()
+            try:
+                ipaddress.ip_address(ip)
+            except ValueError:
+                errors.append({"row": number, "ip_address": ip or None, "reason": "invalid ip_address"})
+                continue
+            records.append({
+                "name": row.get('name') or f"Device-{ip.split('.')[-1]}",
+                "ip_address": ip,
+                "device_type": row.get('device_type') or 'unknown',
+                "mac_address": row.get('mac_address') or None,
+                "subnet": row.get('subnet') or None,
+            })
+            row_numbers.append(number)
+
+        created, conflicts = Database.create_devices(records) if records else ([], [])
+        for c in conflicts:
+            errors.append({"row": row_numbers[c['index']], "ip_address": c['ip_address'], "reason": c['reason']})
+        errors.sort(key=lambda e: e['row'])
+
+        if created:
+            task = asyncio.create_task(_probe_devices(created))
+            background_probes.add(task)
+            task.add_done_callback(background_probes.discard)
+
+        logger.info(f"Imported {len(created)} of {len(rows)} devices, queued {len(created)} checks")
+        return {
+            "success": True,
+            "message": f"تم استيراد {len(created)} جهاز",
+            "data": {
+                "created": _sanitize_for_json(created),
+                "conflicts": errors,
+                "total_rows": len(rows),
+                "queued_checks": len(created)
+            }
+        }
+    except Exception as e:
+        logger.error(f"Import devices error: {e}", exc_info=True)
+        return {"success": False, "message": str(e), "data": {}}
+
+
 @app.put("/api/devices/{device_id}")
 async def update_device(device_id: int, req: UpdateDeviceRequest):
     logger.info(f"PUT /api/devices/{device_id}")
@@ -576,54 +711,20 @@ async def advanced_scan(req: AdvancedScanRequest):
                 "message": "صيغة عنوان الشبكة (Subnet) غير صحيحة. مثال: 192.168.1.0/24"
             }
 
-        hosts = list(network.hosts())
-        if len(hosts) > 1024:
-             return {
-                "success": False,
-                "message": "النطاق كبير جداً للفحص السريع. يرجى تحديد نطاق أصغر (مثلاً /24)"
+        # Any size: the sweep generates addresses lazily, shard by shard,
+        # under the scanner's packet-rate and in-flight limits
+        total_hosts = len(host_range(network))
+        logger.info(f"Scanning {total_hosts} hosts...")
+
+        discovered = [
+            {
+                "ip_address": device.ip_address,
+                "status": "up",
+                "latency_ms": device.latency_ms,
+                "device_type": "unknown"
             }
-
-        logger.info(f"Scanning {len(hosts)} hosts...")
-
-        def ping_host(ip):
-            try:
-                # التصحيح: استخدام _platform بدلاً من platform
-                sysplat = _platform.system().lower()
-                if sysplat == "windows":
-                    cmd = ["ping", "-n", "1", "-w", str(req.timeout * 1000), str(ip)]
-                else:
-                    cmd = ["ping", "-c", "1", "-W", str(req.timeout * 1000), str(ip)]
-                
-                result = subprocess.run(
-                    cmd, 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=req.timeout + 2
-                )
-
-                if result.returncode == 0:
-                    latency = None
-                    out = result.stdout
-                    m = _re.search(r"time[<=](\d+\.?\d*)\s*ms", out)
-                    if m:
-                        latency = float(m.group(1))
-                    return {
-                        "ip_address": str(ip),
-                        "status": "up",
-                        "latency_ms": latency,
-                        "device_type": "unknown"
-                    }
-            except Exception:
-                pass
-            return None
-
-        discovered = []
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = {executor.submit(ping_host, ip): ip for ip in hosts}
-            for future in as_completed(futures):
-                res = future.result()
-                if res:
-                    discovered.append(res)
+            async for device in subnet_scanner.ping_sweep(network, req.timeout)
+        ]
 
         logger.info(f"Scan completed. Found {len(discovered)} active devices.")
         
@@ -632,7 +733,7 @@ async def advanced_scan(req: AdvancedScanRequest):
             "message": f"تم اكتشاف {len(discovered)} أجهزة نشطة",
             "data": {
                 "subnet": str(network),
-                "total_hosts": len(hosts),
+                "total_hosts": total_hosts,
                 "discovered_count": len(discovered),
                 "devices": discovered
             }
@@ -664,32 +765,15 @@ async def refresh_devices_status():
             return {"success": True, "message": "No devices to refresh", "data": []}
 
         # دالة لفحص جهاز واحد وإنشاء التنبيهات إذا لزم الأمر
-        def check_single_device(device):
+        async def check_single_device(device):
             ip = device.get('ip_address')
             device_id = device.get('id')
             try:
-                if _platform.system().lower() == 'windows':
-                    cmd = ['ping', '-n', '1', '-w', '1000', ip]
-                else:
-                    cmd = ['ping', '-c', '1', '-W', '1', ip]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
-                
-                latency = None
-                status = 'down'
+                latency = rtts.get(ip)
+                status = 'up' if ip in rtts else 'down'
                 
-                if result.returncode == 0:
-                    status = 'up'
-                    out = result.stdout
-                    m = _re.search(r'time[<=](\d+\.?\d*)\s*ms', out)
-                    if m:
-                        try:
-                            latency = float(m.group(1))
-                        except Exception:
-                            pass
-                
-                # Update DB
-                Database.update_device_status(device_id, status, latency_ms=latency)
+                # Queue DB update (written behind by the status writer)
+                await status_writer.submit_async(device_id, status, latency)
                 
                 # --- منطق إنشاء التنبيهات التلقائية ---
                 
@@ -723,23 +807,20 @@ async def refresh_devices_status():
                             alert_type="latency"
                         )
 
-                # Fetch updated record to return
-                return Database.get_device(device_id)
+                return device
             
             except Exception as e:
                 logger.error(f"Error checking {ip}: {e}")
                 return device
 
-        updated_devices = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(check_single_device, dev): dev for dev in devices}
-            
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                    updated_devices.append(result)
-                except Exception as e:
-                    logger.error(f"Error in future: {e}")
+        # One concurrent ICMP sweep, then per-device bookkeeping
+        rtts = await _ping_many([d.get('ip_address') for d in devices])
+        for dev in devices:
+            await check_single_device(dev)
+
+        # Probe results are written behind; wait for them before reading back
+        await asyncio.to_thread(status_writer.flush)
+        updated_devices = Database.get_devices()
 
         logger.info(f"✓ Refreshed status for {len(updated_devices)} devices with alerts")
         return {
@@ -775,30 +856,13 @@ async def refresh_devices_status():
         if not devices:
             return {"success": True, "message": "No devices to refresh", "data": []}
 
-        def check_single_device(device):
+        async def check_single_device(device):
             ip = device.get('ip_address')
             device_id = device.get('id')
             try:
-                if _platform.system().lower() == 'windows':
-                    cmd = ['ping', '-n', '1', '-w', '1000', ip]
-                else:
-                    cmd = ['ping', '-c', '1', '-W', '1', ip]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
-                
-                latency = None
-                status = 'down'
-                
-                if result.returncode == 0:
-                    status = 'up'
-                    out = result.stdout
-                    m = _re.search(r"time[<=](\d+\.?\d*)\s*ms", out)
-                    if m:
-                        try:
-                            latency = float(m.group(1))
-                        except Exception:
-                            pass
-                Database.update_device_status(device_id, status, latency_ms=latency)
+                latency = rtts.get(ip)
+                status = 'up' if ip in rtts else 'down'
+                await status_writer.submit_async(device_id, status, latency)
                 
                 # --- منطق إنشاء التنبيهات التلقائية ---
                 
@@ -832,23 +896,20 @@ async def refresh_devices_status():
                             alert_type="latency"
                         )
 
-                # Fetch updated record to return
-                return Database.get_device(device_id)
+                return device
             
             except Exception as e:
                 logger.error(f"Error checking {ip}: {e}")
                 return device # في حالة الخطأ نرجع الجهاز كما هو
 
-        updated_devices = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(check_single_device, dev): dev for dev in devices}
-            
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                    updated_devices.append(result)
-                except Exception as e:
-                    logger.error(f"Error in future: {e}")
+        # One concurrent ICMP sweep, then per-device bookkeeping
+        rtts = await _ping_many([d.get('ip_address') for d in devices])
+        for dev in devices:
+            await check_single_device(dev)
+
+        # Probe results are written behind; wait for them before reading back
+        await asyncio.to_thread(status_writer.flush)
+        updated_devices = Database.get_devices()
         
         logger.info(f"✓ Refreshed status for {len(updated_devices)} devices with auto-resolution")
         return {
@@ -919,13 +980,9 @@ async def resolve_alert_endpoint(alert_id: int):
     """
     logger.info(f"PUT /api/alerts/{alert_id}/resolve")
     try:
-        # استخدام _conn التي تم استيرادها في أعلى الملف
-        conn = _conn()
-        
-        conn.execute("UPDATE alerts SET is_resolved = 1, resolved_at = ? WHERE id = ?", 
-                    (datetime.utcnow().isoformat(), alert_id))
-        conn.close()
-        
+        if not Database.resolve_alert(alert_id):
+            return {"success": False, "message": "فشل حل التنبيه"}
+
         return {"success": True, "message": "تم حل التنبيه"}
     except Exception as e:
         logger.error(f"Resolve alert error: {e}", exc_info=True)
@@ -957,25 +1014,18 @@ async def get_scans(limit: int = 50):
 async def get_subnets():
     logger.info("GET /api/subnets")
     try:
-        devices = Database.get_devices()
-        subnets = {}
-
-        for device in devices:
-            subnet = device.get('subnet', 'unknown')
-            if subnet not in subnets:
-                subnets[subnet] = {
-                    "subnet": subnet,
-                    "device_count": 0,
-                    "online_count": 0
-                }
-
-            subnets[subnet]["device_count"] += 1
-            if device.get('status') == 'up':
-                subnets[subnet]["online_count"] += 1
+        subnets = [
+            {
+                "subnet": s['subnet'],
+                "device_count": s['device_count'],
+                "online_count": s['online_count']
+            }
+            for s in Database.get_subnet_summary()
+        ]
 
         return {
             "success": True,
-            "data": list(subnets.values()),
+            "data": subnets,
             "total": len(subnets)
         }
     except Exception as e:
@@ -989,17 +1039,13 @@ async def get_subnets():
 async def get_statistics():
     logger.info("GET /api/statistics")
     try:
-        devices = Database.get_devices()
-        total_devices = len(devices)
-        up_devices = len([d for d in devices if d.get('status') == 'up'])
-        down_devices = len([d for d in devices if d.get('status') == 'down'])
-
-        latencies = [d.get('latency_ms', 0) for d in devices if d.get('latency_ms')]
-        avg_latency = sum(latencies) / len(latencies) if latencies else 0
+        summary = Database.get_device_summary()
+        total_devices = summary['total']
+        up_devices = summary['up']
+        down_devices = summary['down']
+        avg_latency = summary['avg_latency']
 
-        alerts = Database.get_alerts(limit=100)
-        critical_alerts = len([a for a in alerts if a.get('severity') == 'critical'])
-        warning_alerts = len([a for a in alerts if a.get('severity') == 'warning'])
+        alerts = Database.get_alert_summary()
 
         return {
             "success": True,
@@ -1013,9 +1059,9 @@ async def get_statistics():
                     "avg_latency": round(avg_latency, 2),
                     "packet_loss": 0},
                 "alerts": {
-                    "total": len(alerts),
-                    "critical": critical_alerts,
-                    "warning": warning_alerts}}}
+                    "total": alerts['total'],
+                    "critical": alerts['critical'],
+                    "warning": alerts['warning']}}}
     except Exception as e:
         logger.error(f"Get statistics error: {e}", exc_info=True)
         return {"success": False, "message": str(e), "data": {}}
@@ -1042,12 +1088,34 @@ async def get_bandwidth():
 async def get_performance(days: int = 7):
     logger.info(f"GET /api/network/performance?days={days}")
     try:
+        # Pick the coarsest rollup that still gives a useful number of points
+        if days <= 1:
+            resolution = '1m'
+        elif days <= 14:
+            resolution = '1h'
+        else:
+            resolution = '1d'
+
+        rows = Database.get_latency_rollups(resolution, days)
+        latency = []
+        availability = []
+        packet_loss = []
+        for r in rows:
+            time_label = r['bucket_start'].isoformat()
+            # Same precision as stored latencies, so avg never rounds past max
+            rtt = {k: round(r[f'rtt_{k}'], 3) if r[f'rtt_{k}'] is not None else None
+                   for k in ('min', 'avg', 'max', 'p95')}
+            latency.append({"time": time_label, **rtt})
+            availability.append({"time": time_label, "value": round((1 - r['loss_avg']) * 100, 2)})
+            packet_loss.append({"time": time_label, "value": round(r['loss_avg'] * 100, 2)})
+
         return {
             "success": True,
             "data": {
-                "latency": [],
-                "availability": [],
-                "packet_loss": []
+                "resolution": resolution,
+                "latency": latency,
+                "availability": availability,
+                "packet_loss": packet_loss
             }
         }
     except Exception as e:
@@ -1113,45 +1181,20 @@ async def get_network_status():
 
         # 4. جلب الشبكات الفرعية (Segments) وتحضيرها للواجهة
         # سنستخدم بيانات قاعدة البيانات الحالية
-        devices = Database.get_devices()
-        subnets_map = {}
-        
-        for device in devices:
-            subnet = device.get('subnet', 'Unknown')
-            if subnet not in subnets_map:
-                subnets_map[subnet] = {
-                    "name": subnet,
-                    "devices": 0,
-                    "latency": 0,
-                    "status": 'unknown'
-                }
-            
-            subnets_map[subnet]["devices"] += 1
-            
-            # حساب المتوسط للزمن
-            if device.get('latency_ms'):
-                subnets_map[subnet]["latency"] += device.get('latency_ms')
-            
-            # تحديد الحالة
-            if device.get('status') == 'down':
-                subnets_map[subnet]["status"] = 'warning' # إذا أي جهاز متصل، يمكن تعديل هذا
-
-        # تنظيف البيانات
         segments = []
-        for subnet, data in subnets_map.items():
-            if data["devices"] > 0:
-                avg_latency = data["latency"] / data["devices"]
-                # تحديد الحالة بناء على الـ Latency
-                status = 'up'
-                if avg_latency > 100: status = 'down'
-                elif avg_latency > 50: status = 'warning'
-
-                segments.append({
-                    "name": subnet,
-                    "status": status,
-                    "devices": data["devices"],
-                    "latency": round(avg_latency, 2)
-                })
+        for data in Database.get_subnet_summary():
+            avg_latency = data["avg_latency"]
+            # تحديد الحالة بناء على الـ Latency
+            status = 'up'
+            if avg_latency > 100: status = 'down'
+            elif avg_latency > 50: status = 'warning'
+
+            segments.append({
+                "name": data["subnet"],
+                "status": status,
+                "devices": data["device_count"],
+                "latency": round(avg_latency, 2)
+            })
 
         # إضافة شبكات افتراضية إذا كانت القائمة قصيرة (للمظهر)
         if len(segments) < 3:
@@ -0,0 +1,90 @@
+"""
+Benchmark - per-call connection overhead of the Database layer
+
+Compares the old pattern (open a DuckDB connection, run one statement, close
+it) with the pooled per-thread cursor used by `db._conn()`.
+
+Usage:
+    python benchmarks/bench_connections.py [--iterations N] [--threads T]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import duckdb  # noqa: E402
+
+import db  # noqa: E402
+
+
+def _seed(devices: int):
+    db.Database.init()
+    for i in range(devices):
+        db.Database.create_device(f"Device-{i}", f"10.0.{i // 256}.{i % 256}", 'host')
+
+
+def _open_per_call(iterations: int):
+    for i in range(iterations):
+        conn = duckdb.connect(database=db.DB_PATH, read_only=False)
+        conn.execute("SELECT * FROM devices WHERE ip_address = ?", (f"10.0.0.{i % 200}",)).fetchall()
+        conn.close()
+
+
+def _pooled(iterations: int):
+    for i in range(iterations):
+        db._conn().execute("SELECT * FROM devices WHERE ip_address = ?", (f"10.0.0.{i % 200}",)).fetchall()
+
+
+def _timed(fn, iterations: int, threads: int):
+    start = time.perf_counter()
+    try:
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(fn, [iterations // threads] * threads))
+        else:
+            fn(iterations)
+    except duckdb.Error as e:
+        # Concurrent connect/close on one file is not something DuckDB
+        # guarantees to survive; report it rather than abort the run.
+        print(f"{fn.__name__} failed: {e}")
+        return None
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def _fmt(us) -> str:
+    return f"{us:10.1f} us/call" if us is not None else "    failed"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--devices', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.duckdb')
+        _seed(args.devices)
+
+        # The "before" pattern needs the file to itself, exactly as it had
+        # when every call opened its own connection.
+        db.close_connections()
+        before = _timed(_open_per_call, args.iterations, args.threads)
+        after = _timed(_pooled, args.iterations, args.threads)
+        db.close_connections()
+
+    print(f"iterations={args.iterations} threads={args.threads} devices={args.devices}")
+    print(f"open/close per call : {_fmt(before)}")
+    print(f"pooled cursor       : {_fmt(after)}")
+    if before and after:
+        print(f"speedup             : {before / after:10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
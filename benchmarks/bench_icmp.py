@@ -0,0 +1,85 @@
+"""
+Benchmark - ping sweep: ping subprocesses vs the in-process ICMP engine
+
+Sweeps loopback ranges (127.0.0.0/8 answers on every address) with the
+scanner's subprocess path, one `ping` per host from a 20-thread pool, and
+with `icmp.ping_hosts`, which sends the whole sweep from one socket.
+Needs CAP_NET_RAW or a `net.ipv4.ping_group_range` that includes the
+current group; the subprocess column needs `ping` on PATH.
+
+Usage:
+    python benchmarks/bench_icmp.py [--hosts 254 1024 4096] [--timeout 1] [--repeat 3]
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import icmp  # noqa: E402
+from network_scanner import SubnetScanner  # noqa: E402
+
+
+def _loopback(count: int):
+    return [f"127.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(1, count + 1)]
+
+
+def _subprocess_sweep(ips, timeout: int):
+    scanner = SubnetScanner()
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        found = list(executor.map(lambda ip: scanner._ping_host(ip, timeout), ips))
+    return {d.ip_address: d.latency_ms for d in found if d}
+
+
+def _icmp_sweep(ips, timeout: int):
+    rtts = icmp.ping_hosts(ips, timeout)
+    return {ip: rtt for ip, rtt in rtts.items() if rtt is not None}
+
+
+def _best_of(fn, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _median(values) -> str:
+    values = [v for v in values if v is not None]
+    return f"{statistics.median(values):.3f}" if values else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hosts', type=int, nargs='+', default=[254, 1024, 4096])
+    parser.add_argument('--timeout', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if not icmp.icmp_available():
+        sys.exit("No ICMP socket available (needs CAP_NET_RAW or net.ipv4.ping_group_range)")
+    has_ping = shutil.which('ping') is not None
+    if not has_ping:
+        print("`ping` not found on PATH; subprocess column skipped", file=sys.stderr)
+
+    print(f"{'hosts':>6} {'subprocess s':>13} {'icmp s':>9} {'speedup':>8} {'answered':>9} {'median rtt ms':>14}")
+    for count in args.hosts:
+        ips = _loopback(count)
+        fast, fast_found = _best_of(lambda: _icmp_sweep(ips, args.timeout), args.repeat)
+        if has_ping:
+            slow, _ = _best_of(lambda: _subprocess_sweep(ips, args.timeout), args.repeat)
+            print(f"{count:>6} {slow:>13.3f} {fast:>9.3f} {slow / fast:>7.1f}x {len(fast_found):>9} {_median(fast_found.values()):>14}")
+        else:
+            print(f"{count:>6} {'-':>13} {fast:>9.3f} {'-':>8} {len(fast_found):>9} {_median(fast_found.values()):>14}")
+
+
+if __name__ == '__main__':
+    main()
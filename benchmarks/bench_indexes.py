@@ -0,0 +1,74 @@
+"""
+Benchmark - device history query at 1M rows
+
+Seeds device_status with synthetic rows, then times the old query shape on
+the unindexed table against Database.get_device_history() on the migrated
+schema.
+
+Usage:
+    python benchmarks/bench_indexes.py [--rows 1000000] [--devices 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import db  # noqa: E402
+
+LEGACY_HISTORY = "SELECT * FROM device_status WHERE device_id = ? ORDER BY changed_at DESC LIMIT ?"
+
+
+def _seed(conn, rows: int, devices: int):
+    # Status rows interleave devices the way periodic refreshes do
+    conn.execute(f'''
+        INSERT INTO device_status (device_id, new_status, changed_at)
+        SELECT (i % {devices}) + 1, CASE WHEN i % 7 = 0 THEN 'down' ELSE 'up' END,
+               strftime(TIMESTAMP '2026-01-01' + i * INTERVAL 1 second, '%Y-%m-%dT%H:%M:%S.%f')
+        FROM range({rows}) t(i)
+    ''')
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--devices', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.duckdb')
+        db.Database.init()
+        conn = db._conn()
+        _seed(conn, args.rows, args.devices)
+        device_id = args.devices // 2
+
+        conn.execute("DROP INDEX idx_device_status_device")
+        history_before = _best_of(lambda: conn.execute(LEGACY_HISTORY, (device_id, 50)).fetchall(), args.repeat)
+
+        db._migrate_history_indexes(conn)
+        history_after = _best_of(lambda: db.Database.get_device_history(device_id, 50), args.repeat)
+        db.close_connections()
+
+    print(f"rows={args.rows} devices={args.devices}")
+    print(f"{'query':<16} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, before, after in (('device history', history_before, history_after),):
+        print(f"{name:<16} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
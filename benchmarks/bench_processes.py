@@ -0,0 +1,77 @@
+"""
+Benchmark - ping sweep throughput by number of worker processes
+
+Sweeps a synthetic loopback range (127.0.0.0/8 answers on every address)
+with `SubnetScanner.ping_sweep`, first in-process and then sharded across
+worker processes, and reports the speedup over the in-process sweep. The
+packet-rate cap is lifted so the sweep is CPU bound; gains level off at the
+number of cores. Needs CAP_NET_RAW or a `net.ipv4.ping_group_range` that
+includes the current group.
+
+Usage:
+    python benchmarks/bench_processes.py [--network 127.0.0.0/14] [--processes 1 2 4 8] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import icmp  # noqa: E402
+import network_scanner  # noqa: E402
+from network_scanner import ScanBudget, SubnetScanner  # noqa: E402
+
+
+async def _sweep(network: ipaddress.IPv4Network, processes: int, timeout: float) -> int:
+    scanner = SubnetScanner()
+    found = 0
+    async for _ in scanner.ping_sweep(network, timeout, max_time=600, budget=ScanBudget(pps=0),
+                                      processes=processes):
+        found += 1
+    return found
+
+
+def _best_of(network, processes: int, timeout: float, repeat: int):
+    # Untimed first run: spawns the pool and lets each worker import the scanner
+    if processes > 1:
+        asyncio.run(_sweep(network, processes, timeout))
+    best = None
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = asyncio.run(_sweep(network, processes, timeout))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--network', type=ipaddress.IPv4Network, default=ipaddress.IPv4Network('127.0.0.0/14'))
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--timeout', type=float, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if not icmp.icmp_available():
+        sys.exit("No ICMP socket available (needs CAP_NET_RAW or net.ipv4.ping_group_range)")
+    print(f"{args.network}: {args.network.num_addresses - 2} hosts, {os.cpu_count()} CPUs")
+
+    print(f"{'processes':>9} {'seconds':>8} {'hosts/s':>10} {'speedup':>8} {'answered':>9}")
+    baseline = None
+    try:
+        for processes in args.processes:
+            elapsed, found = _best_of(args.network, processes, args.timeout, args.repeat)
+            baseline = baseline or elapsed
+            print(f"{processes:>9} {elapsed:>8.3f} {found / elapsed:>10.0f} {baseline / elapsed:>7.2f}x {found:>9}")
+    finally:
+        network_scanner.shutdown_process_pool()
+
+
+if __name__ == '__main__':
+    main()
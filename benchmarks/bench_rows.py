@@ -0,0 +1,99 @@
+"""
+Benchmark - row materialization in Database.get_devices()
+
+Compares the previous pandas path (`fetchdf()` followed by a per-cell
+`pd.isna`/`tolist()` sweep) with the cursor path `db._fetch_dicts` uses,
+and with the in-process device cache that now serves get_devices().
+
+Usage:
+    python benchmarks/bench_rows.py [--sizes 10000 100000] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import db  # noqa: E402
+
+
+def _legacy_rows_to_dicts(df):
+    import pandas as pd
+
+    sanitized = []
+    for r in df.to_dict(orient='records'):
+        nr = {}
+        for k, v in r.items():
+            if pd.isna(v):
+                nr[k] = None
+            elif hasattr(v, 'tolist') and not isinstance(v, (str, bytes)):
+                nr[k] = v.tolist()
+            else:
+                nr[k] = v
+        sanitized.append(nr)
+    return sanitized
+
+
+def _legacy_get_devices():
+    df = db._conn().execute("SELECT * EXCLUDE (ip_num) FROM devices ORDER BY created_at DESC, id").fetchdf()
+    return _legacy_rows_to_dicts(df)
+
+
+def _cursor_get_devices():
+    return db._fetch_dicts(db._conn().execute("SELECT * EXCLUDE (ip_num) FROM devices ORDER BY created_at DESC, id"))
+
+
+def _seed(size: int):
+    db.Database.init()
+    db._conn().execute("DELETE FROM devices")
+    db.Database.upsert_devices_from_scan([
+        {
+            'ip_address': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+            'mac_address': None,
+            'device_type': 'host',
+            'subnet': f"10.{i >> 16 & 255}.{i >> 8 & 255}.0/24",
+            'latency_ms': float(i % 50) if i % 3 else None,
+            'interface_name': 'eth0',
+        }
+        for i in range(1, size + 1)
+    ])
+    # Reload the cache after the raw DELETE above
+    db.Database.init()
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.duckdb')
+        print(f"{'rows':>8} {'pandas ms':>12} {'cursor ms':>12} {'cache ms':>12}")
+        for size in args.sizes:
+            _seed(size)
+            assert _legacy_get_devices() == _cursor_get_devices()
+            assert sorted(r['id'] for r in db.Database.get_devices()) == sorted(r['id'] for r in _cursor_get_devices())
+            legacy = _best_of(_legacy_get_devices, args.repeat)
+            lean = _best_of(_cursor_get_devices, args.repeat)
+            cached = _best_of(db.Database.get_devices, args.repeat)
+            print(f"{size:>8} {legacy:>12.1f} {lean:>12.1f} {cached:>12.1f}")
+        db.close_connections()
+
+
+if __name__ == '__main__':
+    main()
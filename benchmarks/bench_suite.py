@@ -0,0 +1,278 @@
+"""
+Benchmark - Database methods and heavy API endpoints on synthetic fleets
+
+Seeds a fresh database per fleet size (devices, device_status history,
+alerts and latency samples), times every public `Database` method and the
+heavy read endpoints, and writes the results as JSON so runs from
+different commits can be compared with --compare.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000 10000 100000] [--status-rows 10000000]
+                                     [--repeat 5] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import duckdb  # noqa: E402
+
+import db  # noqa: E402
+
+# Methods left out on purpose; everything else on Database must be covered
+SKIPPED = {
+    'create_admin_if_not_exists': 'hashes a password with bcrypt on first run only',
+}
+
+
+def _ip(i: int) -> str:
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def _seed(conn, devices: int, status_rows: int, alerts: int, samples: int):
+    now = datetime.utcnow()
+    conn.execute('''
+        INSERT INTO devices (name, ip_address, ip_num, mac_address, device_type, subnet, interface_name, status,
+                             latency_ms, first_seen, last_seen, created_at, updated_at)
+        SELECT 'Device-' || i, ip, inet_aton(ip),
+               printf('02:00:%02x:%02x:%02x:%02x', (i >> 24) & 255, (i >> 16) & 255, (i >> 8) & 255, i & 255),
+               ['router', 'switch', 'host', 'printer'][i % 4 + 1],
+               '10.' || ((i >> 16) & 255) || '.' || ((i >> 8) & 255) || '.0/24', 'eth0',
+               CASE WHEN i % 10 = 0 THEN 'down' ELSE 'up' END,
+               CASE WHEN i % 10 = 0 THEN NULL ELSE (i % 97) * 1.5 END,
+               ts, ts, ts, ts
+        FROM (
+            SELECT i, '10.' || ((i >> 16) & 255) || '.' || ((i >> 8) & 255) || '.' || (i & 255) AS ip,
+                   ?::TIMESTAMP - (? - i) * INTERVAL 1 second AS ts
+            FROM range(1, ? + 1) t(i)
+        )
+    ''', (now, devices, devices))
+    # History spread over 60 days, so half of it is past the archive cutoff
+    conn.execute('''
+        INSERT INTO device_status (device_id, old_status, new_status, changed_at)
+        SELECT (i % ?) + 1, NULL, CASE WHEN i % 7 = 0 THEN 'down' ELSE 'up' END,
+               ?::TIMESTAMP - INTERVAL 60 day + i * (INTERVAL 60 day / ?)
+        FROM range(?) t(i)
+    ''', (devices, now, max(status_rows, 1), status_rows))
+    conn.execute('''
+        INSERT INTO alerts (device_id, title, description, severity, alert_type, is_resolved, created_at)
+        SELECT (i % ?) + 1, 'High latency', 'synthetic', CASE WHEN i % 5 = 0 THEN 'critical' ELSE 'warning' END,
+               'latency', i % 2, ?::TIMESTAMP - INTERVAL 60 day + i * (INTERVAL 60 day / ?)
+        FROM range(?) t(i)
+    ''', (devices, now, max(alerts, 1), alerts))
+    conn.execute('''
+        INSERT INTO latency_samples (device_id, sampled_at, rtt_ms, loss)
+        SELECT (i % ?) + 1, ?::TIMESTAMP - INTERVAL 1 day + i * (INTERVAL 1 day / ?),
+               CASE WHEN i % 10 = 0 THEN NULL ELSE (i % 97) * 1.5 END,
+               CASE WHEN i % 10 = 0 THEN 1.0 ELSE 0.0 END
+        FROM range(?) t(i)
+    ''', (devices, now, max(samples, 1), samples))
+
+
+def _cases(devices: int):
+    """(name, callable) pairs; write cases use fresh keys on every call."""
+    Database = db.Database
+    counter = iter(range(1, 1 << 30))
+    mid = devices // 2
+    subnet = f"10.{mid >> 16 & 255}.{mid >> 8 & 255}.0/24"
+    first_page = Database.get_devices_page(limit=50)
+
+    def fresh_ip():
+        # New devices live in 172.16/12 so they never collide with the fleet
+        n = next(counter)
+        return f"172.{16 + n // 65536 % 16}.{n // 256 % 256}.{n % 256}"
+
+    def create_device():
+        return Database.create_device('bench', fresh_ip(), 'host')
+
+    def delete_device():
+        return Database.delete_device(create_device()['id'])
+
+    def create_devices():
+        return Database.create_devices([{'name': 'bench', 'ip_address': fresh_ip(), 'device_type': 'host'} for _ in range(100)])
+
+    def upsert_devices_from_scan():
+        return Database.upsert_devices_from_scan([
+            {'ip_address': _ip(i), 'mac_address': None, 'device_type': 'host', 'subnet': subnet,
+             'latency_ms': 1.0, 'interface_name': 'eth0'}
+            for i in range(mid, min(mid + 254, devices + 1))
+        ])
+
+    def update_device_statuses():
+        now = datetime.utcnow()
+        return Database.update_device_statuses([(i, 'up', 2.0, now) for i in range(1, min(devices, 1000) + 1)])
+
+    def resolve_alert():
+        return Database.resolve_alert(Database.create_alert('bench', 'bench', 'warning', mid)['id'])
+
+    return [
+        ('init', Database.init),
+        ('user_exists', lambda: Database.user_exists('bench')),
+        ('get_user', lambda: Database.get_user('bench')),
+        ('get_user_by_id', lambda: Database.get_user_by_id(1)),
+        ('create_user', lambda: Database.create_user(f"bench-{next(counter)}", 'x', 'bench@local')),
+        ('get_devices', Database.get_devices),
+        ('get_devices(limit=100)', lambda: Database.get_devices(100)),
+        ('get_devices_page', lambda: Database.get_devices_page(limit=50)),
+        ('get_devices_page(status=down)', lambda: Database.get_devices_page(limit=50, status='down')),
+        ('get_devices_page(sort=ip_address)', lambda: Database.get_devices_page(limit=50, sort='ip_address')),
+        ('get_devices_page(cursor)', lambda: Database.get_devices_page(limit=50, cursor=first_page['next_cursor'])),
+        ('get_device', lambda: Database.get_device(mid)),
+        ('get_device_by_ip', lambda: Database.get_device_by_ip(_ip(mid))),
+        ('get_device_by_mac', lambda: Database.get_device_by_mac('02:00:00:00:00:01')),
+        ('get_devices_by_subnet', lambda: Database.get_devices_by_subnet(subnet)),
+        ('get_device_summary', Database.get_device_summary),
+        ('get_subnet_summary', Database.get_subnet_summary),
+        ('get_alert_summary', Database.get_alert_summary),
+        ('get_alerts', lambda: Database.get_alerts(100)),
+        ('get_device_history', lambda: Database.get_device_history(mid, 50)),
+        ('get_subnet_scans', lambda: Database.get_subnet_scans(50)),
+        ('get_latency_rollups', lambda: Database.get_latency_rollups('1h', 7)),
+        ('create_device', create_device),
+        ('create_devices', create_devices),
+        ('update_device', lambda: Database.update_device(mid, {'name': 'bench'})),
+        ('delete_device', delete_device),
+        ('update_device_status', lambda: Database.update_device_status(mid, 'up', 1.0)),
+        ('update_device_statuses', update_device_statuses),
+        ('upsert_device_from_scan', lambda: Database.upsert_device_from_scan(_ip(mid), None, 'host', subnet, 1.0)),
+        ('upsert_devices_from_scan', upsert_devices_from_scan),
+        ('create_alert', lambda: Database.create_alert('bench', 'bench', 'warning', mid)),
+        ('resolve_alert', resolve_alert),
+        ('create_scan', lambda: Database.create_scan('bench', devices, devices, 1)),
+        ('create_subnet_scan', lambda: Database.create_subnet_scan(subnet, 'eth0', 254, 254, 1)),
+        ('get_last_full_sweep', lambda: Database.get_last_full_sweep(subnet)),
+        ('rollup_latency', Database.rollup_latency),
+        ('prune_latency_samples', Database.prune_latency_samples),
+        ('archive_history', Database.archive_history),
+    ]
+
+
+def _endpoint_cases(devices: int):
+    try:
+        from fastapi.testclient import TestClient
+        import api
+    except Exception as e:
+        print(f"skipping endpoints: {e}", file=sys.stderr)
+        return []
+    # No context manager: startup would start the writer and background jobs
+    client = TestClient(api.app)
+    mid = devices // 2
+    return [
+        ('GET /api/devices', lambda: client.get('/api/devices')),
+        ('GET /api/devices?status=down&sort=ip_address', lambda: client.get('/api/devices', params={'status': 'down', 'sort': 'ip_address'})),
+        ('GET /api/statistics', lambda: client.get('/api/statistics')),
+        ('GET /api/subnets', lambda: client.get('/api/subnets')),
+        ('GET /api/devices/{id}/history', lambda: client.get(f'/api/devices/{mid}/history')),
+    ]
+
+
+def _time(fn, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - start) * 1000)
+    return {
+        'first_ms': round(runs[0], 3),
+        'min_ms': round(min(runs), 3),
+        'median_ms': round(statistics.median(runs), 3),
+        'mean_ms': round(statistics.fmean(runs), 3),
+        'runs': repeat,
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+
+def _check_coverage(names):
+    covered = {n.split('(')[0] for n in names}
+    public = {n for n, _ in inspect.getmembers(db.Database, inspect.isfunction) if not n.startswith('_')}
+    missing = sorted(public - covered - set(SKIPPED))
+    if missing:
+        print(f"warning: Database methods without a benchmark: {', '.join(missing)}", file=sys.stderr)
+
+
+def _compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r['devices'], r['name']): r for r in json.load(f)['results']}
+    print(f"\n{'devices':>8} {'case':<46} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for r in results:
+        old = baseline.get((r['devices'], r['name']))
+        if not old:
+            continue
+        ratio = r['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        print(f"{r['devices']:>8} {r['name']:<46} {old['median_ms']:>10.3f} {r['median_ms']:>10.3f} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--status-rows', type=int, default=10_000_000)
+    parser.add_argument('--alerts', type=int, default=100_000)
+    parser.add_argument('--samples', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-endpoints', action='store_true')
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare medians against")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db.ARCHIVE_DIR = os.path.join(tmp, 'archive')
+        for size in args.sizes:
+            db.DB_PATH = os.path.join(tmp, f'bench-{size}.duckdb')
+            db.Database.init()
+            start = time.perf_counter()
+            _seed(db._conn(), size, args.status_rows, args.alerts, args.samples)
+            db.Database.init()
+            print(f"seeded {size} devices / {args.status_rows} status rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+            cases = _cases(size)
+            _check_coverage(name for name, _ in cases)
+            if not args.no_endpoints:
+                # Endpoints first: the write cases below change the data they read
+                cases = _endpoint_cases(size) + cases
+            for name, fn in cases:
+                timing = _time(fn, args.repeat)
+                results.append({'devices': size, 'name': name, **timing})
+                print(f"{size:>8} {name:<46} {timing['median_ms']:>10.3f} ms", file=sys.stderr)
+            db.close_connections()
+
+    report = {
+        'commit': _commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'duckdb': duckdb.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
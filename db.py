@@ -9,13 +9,19 @@ try:
 except Exception:
     duckdb = None
 
+import asyncio
+import base64
+import functools
+import ipaddress
+import json
 import logging
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
-
-import pandas as pd
+from typing import Dict, List, Optional, Tuple
 
 from security import hash_password
 
@@ -27,186 +33,472 @@ DB_PATH = str(DB_DIR / "data.duckdb")
 
 DB_DIR.mkdir(exist_ok=True)
 
+# Raw latency samples older than this are dropped once rolled up
+LATENCY_RETENTION_DAYS = int(os.environ.get('LATENCY_RETENTION_DAYS', '7'))
+
+# History rows older than this move from the live tables to Parquet files
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', '30'))
+ARCHIVE_DIR = os.environ.get('HISTORY_ARCHIVE_DIR', str(DB_DIR / "archive"))
+
+# Archived table -> (time column, extra condition). Open alerts stay live
+# however old they are.
+_ARCHIVE_TABLES = {
+    'device_status': ('changed_at', ''),
+    'alerts': ('created_at', 'AND is_resolved = 1'),
+}
+
+# Rollup resolution -> (date_trunc unit, bucket width)
+LATENCY_RESOLUTIONS = {
+    '1m': ('minute', timedelta(minutes=1)),
+    '1h': ('hour', timedelta(hours=1)),
+    '1d': ('day', timedelta(days=1)),
+}
+
+
+class _ConnectionManager:
+    """Process-wide DuckDB connection shared by every Database call.
+
+    DuckDB allows only one read-write handle on a database file per process,
+    and opening it is expensive (catalog load, WAL replay). The manager keeps
+    a single writer connection open and hands each thread its own cursor
+    derived from it, so concurrent callers never share a cursor.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._writer = None
+        self._path = None
+        self._generation = 0
+
+    def writer(self):
+        with self.lock:
+            if self._writer is None or self._path != DB_PATH:
+                self._close_locked()
+                self._writer = duckdb.connect(database=DB_PATH, read_only=False)
+                self._path = DB_PATH
+            return self._writer
+
+    def cursor(self):
+        local = self._local
+        cur = getattr(local, 'cursor', None)
+        if cur is not None and local.generation == self._generation and self._path == DB_PATH:
+            return cur
+        cur = self.writer().cursor()
+        local.cursor = cur
+        local.generation = self._generation
+        return cur
+
+    def close(self):
+        with self.lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        # Closing the writer also closes every cursor derived from it; bumping
+        # the generation makes threads holding one open a fresh cursor.
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+        self._writer = None
+        self._path = None
+        self._generation += 1
+
+
+_pool = _ConnectionManager()
+
 
 def _conn():
-    return duckdb.connect(database=DB_PATH, read_only=False)
+    """Return the calling thread's cursor on the shared connection.
 
+    The cursor is owned by the pool; callers must not close it.
+    """
+    return _pool.cursor()
 
-def _rows_to_dicts(df):
-    try:
-        recs = df.to_dict(orient='records')
-        sanitized = []
-        for r in recs:
-            nr = {}
-            for k, v in r.items():
-                try:
-                    if pd.isna(v):
-                        nr[k] = None
-                    else:
-                        # convert numpy scalars/arrays to native Python types
-                        # when possible
-                        if hasattr(v, 'tolist') and not isinstance(v, (str, bytes)):
-                            try:
-                                nr[k] = v.tolist()
-                            except Exception:
-                                nr[k] = v
-                        else:
-                            nr[k] = v
-                except Exception:
-                    nr[k] = None
-            sanitized.append(nr)
-        return sanitized
-    except Exception:
-        return []
 
+def close_connections():
+    _pool.close()
 
-class Database:
-    @staticmethod
-    def init():
-        conn = _conn()
 
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER,
-                username TEXT UNIQUE,
-                password TEXT,
-                email TEXT,
-                role TEXT,
-                is_active INTEGER,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
+def _fetch_dicts(cur) -> List[Dict]:
+    """Materialize a cursor's result set as a list of dicts.
 
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS devices (
-                id INTEGER,
-                name TEXT,
-                ip_address TEXT UNIQUE,
-                mac_address TEXT,
-                device_type TEXT,
-                subnet TEXT,
-                status TEXT,
-                is_monitored INTEGER,
-                is_critical INTEGER,
-                latency_ms DOUBLE,
-                packet_loss_percent DOUBLE,
-                first_seen TEXT,
-                last_seen TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            )
-        ''')
+    Built straight from ``cursor.description`` and ``fetchall()``; the driver
+    already returns NULL as None and values as native Python types.
+    """
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, row)) for row in cur.fetchall()]
 
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS scans (
-                id INTEGER,
-                scan_type TEXT,
-                total_devices INTEGER,
-                devices_online INTEGER,
-                duration_ms INTEGER,
-                status TEXT,
-                error_message TEXT,
-                scanned_at TEXT,
-                created_at TEXT
-            )
-        ''')
 
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS subnet_scans (
-                id INTEGER,
-                subnet TEXT,
-                interface_name TEXT,
-                total_devices INTEGER,
-                devices_discovered INTEGER,
-                duration_ms INTEGER,
-                status TEXT,
-                error_message TEXT,
-                scanned_at TEXT,
-                created_at TEXT
-            )
-        ''')
+def _fetch_one(cur) -> Optional[Dict]:
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cur.description], row))
 
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS device_status (
-                id INTEGER,
-                device_id INTEGER,
-                old_status TEXT,
-                new_status TEXT,
-                reason TEXT,
-                changed_at TEXT
+
+# Tables whose integer ``id`` is allocated by a DuckDB sequence.
+_ID_TABLES = ('users', 'devices', 'scans', 'subnet_scans', 'device_status', 'alerts')
+
+
+def _ensure_id_sequence(conn, table: str):
+    """Create ``<table>_id_seq`` if missing, starting past any existing ids."""
+    seq = f"{table}_id_seq"
+    if conn.execute("SELECT 1 FROM duckdb_sequences() WHERE sequence_name = ?", (seq,)).fetchone():
+        return
+    start = 1
+    if conn.execute("SELECT 1 FROM duckdb_tables() WHERE table_name = ?", (table,)).fetchone():
+        start = (conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0) + 1
+    conn.execute(f"CREATE SEQUENCE {seq} START {start}")
+
+
+def _migrate_baseline(conn):
+    """Schema as it stood before versioning; safe on databases that predate it."""
+    for table in _ID_TABLES:
+        _ensure_id_sequence(conn, table)
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER DEFAULT nextval('users_id_seq'),
+            username TEXT UNIQUE,
+            password TEXT,
+            email TEXT,
+            role TEXT,
+            is_active INTEGER,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS devices (
+            id INTEGER DEFAULT nextval('devices_id_seq'),
+            name TEXT,
+            ip_address TEXT UNIQUE,
+            mac_address TEXT,
+            device_type TEXT,
+            subnet TEXT,
+            status TEXT,
+            is_monitored INTEGER,
+            is_critical INTEGER,
+            latency_ms DOUBLE,
+            packet_loss_percent DOUBLE,
+            first_seen TEXT,
+            last_seen TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scans (
+            id INTEGER DEFAULT nextval('scans_id_seq'),
+            scan_type TEXT,
+            total_devices INTEGER,
+            devices_online INTEGER,
+            duration_ms INTEGER,
+            status TEXT,
+            error_message TEXT,
+            scanned_at TEXT,
+            created_at TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subnet_scans (
+            id INTEGER DEFAULT nextval('subnet_scans_id_seq'),
+            subnet TEXT,
+            interface_name TEXT,
+            total_devices INTEGER,
+            devices_discovered INTEGER,
+            duration_ms INTEGER,
+            status TEXT,
+            error_message TEXT,
+            scanned_at TEXT,
+            created_at TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS device_status (
+            id INTEGER DEFAULT nextval('device_status_id_seq'),
+            device_id INTEGER,
+            old_status TEXT,
+            new_status TEXT,
+            reason TEXT,
+            changed_at TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER DEFAULT nextval('alerts_id_seq'),
+            device_id INTEGER,
+            title TEXT,
+            description TEXT,
+            severity TEXT,
+            alert_type TEXT,
+            is_resolved INTEGER,
+            created_at TEXT,
+            resolved_at TEXT
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latency_samples (
+            device_id INTEGER,
+            sampled_at TIMESTAMP,
+            rtt_ms DOUBLE,
+            loss DOUBLE
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latency_rollups (
+            resolution TEXT,
+            device_id INTEGER,
+            bucket_start TIMESTAMP,
+            samples INTEGER,
+            rtt_samples INTEGER,
+            rtt_min DOUBLE,
+            rtt_avg DOUBLE,
+            rtt_max DOUBLE,
+            rtt_p95 DOUBLE,
+            loss_avg DOUBLE,
+            PRIMARY KEY (resolution, device_id, bucket_start)
+        )
+    ''')
+
+    # Databases created before ids came from sequences have no default
+    for table in _ID_TABLES:
+        conn.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+
+    # Ensure devices table has required columns
+    conn.execute("ALTER TABLE devices ADD COLUMN IF NOT EXISTS subnet TEXT")
+    conn.execute("ALTER TABLE devices ADD COLUMN IF NOT EXISTS interface_name TEXT")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_devices_subnet ON devices(subnet)')
+
+
+# Entity tables that get a primary key on ``id``. device_status is an
+# append-only log read by device_id, so it gets a device_id index instead of
+# an ART entry per row for a key nothing looks up.
+_PK_TABLES = ('users', 'devices', 'scans', 'subnet_scans', 'alerts')
+
+
+def _migrate_primary_keys(conn):
+    for table in _PK_TABLES:
+        if conn.execute("SELECT 1 FROM duckdb_constraints() WHERE table_name = ? AND constraint_type = 'PRIMARY KEY'", (table,)).fetchone():
+            continue
+        # Ids handed out by the old MAX(id)+1 allocator can be NULL or
+        # duplicated when writers raced; renumber those rows first.
+        conn.execute(f'''
+            UPDATE {table} SET id = nextval('{table}_id_seq')
+            WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, id, row_number() OVER (PARTITION BY id ORDER BY rowid) AS rn FROM {table}
+                ) WHERE id IS NULL OR rn > 1
             )
         ''')
+        # DuckDB cannot alter a table that has indexes depending on it
+        indexes = conn.execute("SELECT index_name, sql FROM duckdb_indexes() WHERE table_name = ?", (table,)).fetchall()
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX {name}")
+        conn.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+        for _, sql in indexes:
+            conn.execute(sql)
+
+
+def _migrate_history_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_device_status_device ON device_status(device_id)")
+
+
+# Columns that were stored as ISO-8601 TEXT before migration 4
+_TIME_COLUMNS = {
+    'users': ('created_at', 'updated_at'),
+    'devices': ('first_seen', 'last_seen', 'created_at', 'updated_at'),
+    'scans': ('scanned_at', 'created_at'),
+    'subnet_scans': ('scanned_at', 'created_at'),
+    'device_status': ('changed_at',),
+    'alerts': ('created_at', 'resolved_at'),
+}
+
+
+def _rebuild_table(conn, table: str, types: Dict[str, str]):
+    """Recreate ``table`` with some columns converted to new types.
+
+    DuckDB refuses ALTER COLUMN ... TYPE while constraints or indexes depend
+    on the table, so copy the rows into a new table and swap it in.
+    Values that do not convert become NULL rather than failing the migration.
+    The copy, drop and rename commit together; a ``{table}_new`` left behind
+    by an older interrupted run without ``table`` itself is renamed back.
+    """
+    existing = {r[0] for r in conn.execute("SELECT table_name FROM duckdb_tables() WHERE table_name IN (?, ?)", (table, f"{table}_new")).fetchall()}
+    if table not in existing and f"{table}_new" in existing:
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    columns = conn.execute("SELECT column_name, data_type, column_default FROM duckdb_columns() WHERE table_name = ? ORDER BY column_index", (table,)).fetchall()
+    if all(dtype == types.get(name, dtype) for name, dtype, _ in columns):
+        return
+    constraints = [r[0] for r in conn.execute("SELECT constraint_text FROM duckdb_constraints() WHERE table_name = ? AND constraint_type IN ('PRIMARY KEY', 'UNIQUE')", (table,)).fetchall()]
+    indexes = [r[0] for r in conn.execute("SELECT sql FROM duckdb_indexes() WHERE table_name = ?", (table,)).fetchall()]
+    definitions = []
+    selects = []
+    for name, dtype, default in columns:
+        target = types.get(name, dtype)
+        definitions.append(f"{name} {target}" + (f" DEFAULT {default}" if default else ""))
+        selects.append(f"TRY_CAST({name} AS {target})" if target != dtype else name)
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {table}_new")
+        conn.execute(f"CREATE TABLE {table}_new ({', '.join(definitions + constraints)})")
+        conn.execute(f"INSERT INTO {table}_new SELECT {', '.join(selects)} FROM {table}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    # Outside the transaction: index builds need it free of pending writes
+    for sql in indexes:
+        conn.execute(sql)
+
+
+def _migrate_native_types(conn):
+    # Dotted-quad text to a sortable integer; NULL for anything else
+    conn.execute('''
+        CREATE OR REPLACE MACRO inet_aton(ip) AS
+        CASE WHEN regexp_full_match(ip, '\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}') THEN
+            (TRY_CAST(split_part(ip, '.', 1) AS UTINYINT)::UINTEGER << 24) +
+            (TRY_CAST(split_part(ip, '.', 2) AS UTINYINT)::UINTEGER << 16) +
+            (TRY_CAST(split_part(ip, '.', 3) AS UTINYINT)::UINTEGER << 8) +
+            TRY_CAST(split_part(ip, '.', 4) AS UTINYINT)::UINTEGER
+        END
+    ''')
+    for table, columns in _TIME_COLUMNS.items():
+        _rebuild_table(conn, table, {column: 'TIMESTAMP' for column in columns})
+    conn.execute("ALTER TABLE devices ADD COLUMN IF NOT EXISTS ip_num UINTEGER")
+    conn.execute("UPDATE devices SET ip_num = inet_aton(ip_address) WHERE ip_num IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_devices_ip_num ON devices(ip_num)")
+
+
+def _migrate_subnet_scan_kind(conn):
+    conn.execute("ALTER TABLE subnet_scans ADD COLUMN IF NOT EXISTS full_sweep BOOLEAN DEFAULT FALSE")
+
+
+def _migrate_open_ports(conn):
+    conn.execute("ALTER TABLE devices ADD COLUMN IF NOT EXISTS open_ports INTEGER[]")
 
+
+# Ordered schema migrations: (version, description, step). Each step runs
+# once and is recorded in schema_version. Steps are not wrapped in a single
+# transaction (DuckDB cannot build an index in a transaction that has
+# pending updates), so they must be safe to re-run after a partial failure.
+MIGRATIONS = [
+    (1, "baseline schema", _migrate_baseline),
+    (2, "primary keys on entity tables", _migrate_primary_keys),
+    (3, "device_status lookup index", _migrate_history_indexes),
+    (4, "native timestamps and integer IPv4 addresses", _migrate_native_types),
+    (5, "full-sweep flag on subnet scans", _migrate_subnet_scan_kind),
+    (6, "open TCP ports on devices", _migrate_open_ports),
+]
+
+
+# Sort keys accepted by the device listing; a leading '-' sorts descending
+DEVICE_SORT_KEYS = ('id', 'name', 'ip_address', 'status', 'device_type', 'subnet', 'latency_ms', 'last_seen', 'created_at')
+
+
+def _device_filters(status: Optional[str], subnet: Optional[str], device_type: Optional[str]) -> Tuple[List[str], List]:
+    clauses = []
+    params = []
+    for column, value in (('status', status), ('subnet', subnet), ('device_type', device_type)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return clauses, params
+
+
+def _device_order(sort: str) -> Tuple[str, bool]:
+    column = sort.lstrip('-')
+    if column not in DEVICE_SORT_KEYS:
+        raise ValueError(f"Unsupported sort key: {sort}")
+    # Addresses order numerically, not as strings
+    if column == 'ip_address':
+        column = 'ip_num'
+    return column, sort.startswith('-')
+
+
+def _encode_cursor(value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+
+def _ipv4_range(cidr: str) -> Optional[Tuple[int, int]]:
+    try:
+        network = ipaddress.IPv4Network(cidr, strict=False)
+    except ValueError:
+        return None
+    return int(network.network_address), int(network.broadcast_address)
+
+
+def _keyset_clause(column: str, descending: bool, cursor: str) -> Tuple[str, List]:
+    """Predicate selecting rows after ``cursor`` in ``ORDER BY column, id`` order.
+
+    NULLs sort last in both directions, matching the ORDER BY used for pages.
+    """
+    value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    op = '<' if descending else '>'
+    if value is None:
+        return f"({column} IS NULL AND id {op} ?)", [last_id]
+    return f"({column} {op} ? OR ({column} = ? AND id {op} ?) OR {column} IS NULL)", [value, value, last_id]
+
+
+def _device_write(func):
+    """Run a device-mutating ``Database`` method under the device cache lock."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with device_cache.lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class Database:
+    @staticmethod
+    def init():
+        conn = _conn()
         conn.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER,
-                device_id INTEGER,
-                title TEXT,
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
                 description TEXT,
-                severity TEXT,
-                alert_type TEXT,
-                is_resolved INTEGER,
-                created_at TEXT,
-                resolved_at TEXT
+                applied_at TIMESTAMP
             )
         ''')
-
-        conn.close()
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(conn)
+            conn.execute("INSERT INTO schema_version VALUES (?, ?, ?)", (version, description, datetime.utcnow()))
+            logger.info(f"[OK] Applied schema migration {version}: {description}")
+        _refresh_history_views(conn)
+        device_cache.load(_fetch_dicts(conn.execute("SELECT * EXCLUDE (ip_num) FROM devices")))
         logger.info(f"[OK] DuckDB initialized at {DB_PATH}")
-        # Ensure devices table has required columns
-        try:
-            conn = _conn()
-            conn.execute("ALTER TABLE devices ADD COLUMN subnet TEXT")
-            conn.close()
-        except Exception:
-            try:
-                conn.close()
-            except Exception:
-                pass
-        
-        try:
-            conn = _conn()
-            conn.execute("ALTER TABLE devices ADD COLUMN interface_name TEXT")
-            conn.close()
-        except Exception:
-            # column may already exist or DuckDB may not support IF NOT EXISTS;
-            # ignore errors
-            try:
-                conn.close()
-            except Exception:
-                pass
-        
-        try:
-            conn = _conn()
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_devices_subnet ON devices(subnet)')
-            conn.close()
-        except Exception:
-            # index may already exist or column may not exist yet;
-            # ignore errors
-            try:
-                conn.close()
-            except Exception:
-                pass
 
     @staticmethod
     def create_admin_if_not_exists():
         try:
             conn = _conn()
-            df = conn.execute("SELECT COUNT(*) AS cnt FROM users").fetchdf()
-            cnt = int(df['cnt'].iloc[0]) if not df.empty else 0
+            cnt = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
 
             if cnt == 0:
                 hashed = hash_password('admin@123')
-                now = datetime.utcnow().isoformat()
-                uid = Database._next_id('users')
+                now = datetime.utcnow()
                 # FIXED: Moved arguments to single line to prevent syntax errors
-                conn.execute("INSERT INTO users (id, username, password, email, role, is_active, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?)", (uid, 'admin', hashed, 'admin@local', 'admin', 1, now, now))
+                conn.execute("INSERT INTO users (username, password, email, role, is_active, created_at, updated_at) VALUES (?,?,?,?,?,?,?)", ('admin', hashed, 'admin@local', 'admin', 1, now, now))
                 logger.info("[OK] Default admin user created (username: admin)")
             else:
                 logger.info("[SKIP] Admin user exists")
 
-            conn.close()
         except Exception as e:
             logger.error(f"Failed to create admin user: {e}")
 
@@ -214,9 +506,8 @@ class Database:
     def user_exists(username: str) -> bool:
         try:
             conn = _conn()
-            df = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchdf()
-            conn.close()
-            return not df.empty
+            cur = conn.execute("SELECT id FROM users WHERE username = ?", (username,))
+            return cur.fetchone() is not None
         except Exception as e:
             logger.error(f"Error checking user existence: {e}")
             return False
@@ -225,10 +516,8 @@ class Database:
     def get_user(username: str) -> Optional[Dict]:
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            cur = conn.execute("SELECT * FROM users WHERE username = ?", (username,))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error fetching user: {e}")
             return None
@@ -237,99 +526,201 @@ class Database:
     def get_user_by_id(user_id: int) -> Optional[Dict]:
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            cur = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error fetching user by ID: {e}")
             return None
 
-    @staticmethod
-    def _next_id(table: str) -> int:
-        try:
-            conn = _conn()
-            df = conn.execute(f"SELECT MAX(id) AS m FROM {table}").fetchdf()
-            conn.close()
-            if df.empty:
-                return 1
-            m = df['m'].iloc[0]
-            if pd.isna(m):
-                return 1
-            return int(m) + 1
-        except Exception as e:
-            logger.warning(f"Could not get next id for {table}: {e}")
-            return 1
-
     @staticmethod
     def create_user(username: str, password: str, email: str, role: str = 'viewer') -> Optional[Dict]:
         try:
             conn = _conn()
-            now = datetime.utcnow().isoformat()
-            uid = Database._next_id('users')
-            conn.execute("INSERT INTO users (id, username, password, email, role, is_active, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?)", (uid, username, password, email, role, 1, now, now))
-            df = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            now = datetime.utcnow()
+            cur = conn.execute("INSERT INTO users (username, password, email, role, is_active, created_at, updated_at) VALUES (?,?,?,?,?,?,?) RETURNING *", (username, password, email, role, 1, now, now))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error creating user: {e}")
             return None
 
     @staticmethod
     def get_devices(limit: Optional[int] = None) -> List[Dict]:
+        if device_cache.ready:
+            return device_cache.snapshot(limit)[1]
         try:
             conn = _conn()
             if limit:
-                df = conn.execute("SELECT * FROM devices ORDER BY created_at DESC LIMIT ?", (limit,)).fetchdf()
+                cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices ORDER BY created_at DESC LIMIT ?", (limit,))
             else:
-                df = conn.execute("SELECT * FROM devices ORDER BY created_at DESC").fetchdf()
-            conn.close()
-            return _rows_to_dicts(df)
+                cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices ORDER BY created_at DESC")
+            return _fetch_dicts(cur)
         except Exception as e:
             logger.error(f"Error fetching devices: {e}")
             return []
 
+    @staticmethod
+    def get_devices_page(limit: int = 50, offset: int = 0, status: Optional[str] = None, subnet: Optional[str] = None,
+                         device_type: Optional[str] = None, sort: str = '-created_at', cursor: Optional[str] = None) -> Dict:
+        """One page of devices plus the filtered total, in a single query.
+
+        Pages by ``offset`` or, when ``cursor`` (a previous page's
+        ``next_cursor``) is given, by keyset on ``(sort column, id)``.
+        Raises ValueError for an unknown sort key, malformed cursor, or a
+        ``limit`` below 1 or negative ``offset``.
+        """
+        if limit < 1 or offset < 0:
+            raise ValueError("limit must be at least 1 and offset not negative")
+        column, descending = _device_order(sort)
+        filters, params = _device_filters(status, subnet, device_type)
+        page_filters, page_params = list(filters), list(params)
+        if cursor:
+            try:
+                clause, clause_params = _keyset_clause(column, descending, cursor)
+            except Exception:
+                raise ValueError("Invalid cursor")
+            page_filters.append(clause)
+            page_params.extend(clause_params)
+            offset = 0
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+        page_where = f"WHERE {' AND '.join(page_filters)}" if page_filters else ""
+        direction = 'DESC' if descending else 'ASC'
+        conn = _conn()
+        cur = conn.execute(f'''
+            SELECT t.total_count, p.*
+            FROM (SELECT COUNT(*) AS total_count FROM devices {where}) t
+            LEFT JOIN (
+                SELECT * FROM devices {page_where}
+                ORDER BY {column} {direction} NULLS LAST, id {direction}
+                LIMIT ? OFFSET ?
+            ) p ON TRUE
+            ORDER BY p.{column} {direction} NULLS LAST, p.id {direction}
+        ''', (*params, *page_params, limit, offset))
+        rows = _fetch_dicts(cur)
+        total = rows[0].pop('total_count') if rows else 0
+        devices = []
+        for r in rows:
+            r.pop('total_count', None)
+            if r['id'] is not None:
+                devices.append(r)
+        next_cursor = None
+        if devices and len(devices) == limit:
+            last = devices[-1]
+            next_cursor = _encode_cursor(last[column], last['id'])
+        for r in devices:
+            r.pop('ip_num', None)
+        return {"data": devices, "total": total, "next_cursor": next_cursor}
+
     @staticmethod
     def get_device(device_id: int) -> Optional[Dict]:
+        if device_cache.ready:
+            return device_cache.get(device_id)
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM devices WHERE id = ?", (device_id,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices WHERE id = ?", (device_id,))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error fetching device: {e}")
             return None
 
     @staticmethod
     def get_device_by_ip(ip_address: str) -> Optional[Dict]:
+        if device_cache.ready:
+            return device_cache.get_by_ip(ip_address)
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM devices WHERE ip_address = ?", (ip_address,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices WHERE ip_address = ?", (ip_address,))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error fetching device by IP: {e}")
             return None
 
     @staticmethod
+    def get_device_by_mac(mac_address: str) -> Optional[Dict]:
+        if device_cache.ready:
+            return device_cache.get_by_mac(mac_address)
+        try:
+            conn = _conn()
+            cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices WHERE lower(mac_address) = lower(?) ORDER BY last_seen DESC NULLS LAST LIMIT 1", (mac_address,))
+            return _fetch_one(cur)
+        except Exception as e:
+            logger.error(f"Error fetching device by MAC: {e}")
+            return None
+
+    @staticmethod
+    @_device_write
     def create_device(name: str, ip_address: str, device_type: str, mac_address: Optional[str] = None, subnet: Optional[str] = None) -> Optional[Dict]:
         try:
             conn = _conn()
-            now = datetime.utcnow().isoformat()
-            did = Database._next_id('devices')
-            conn.execute("INSERT INTO devices (id, name, ip_address, mac_address, device_type, subnet, status, first_seen, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?,?)", (did, name, ip_address, mac_address, device_type, subnet, 'unknown', now, now, now))
-            df = conn.execute("SELECT * FROM devices WHERE ip_address = ?", (ip_address,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            now = datetime.utcnow()
+            cur = conn.execute("INSERT INTO devices (name, ip_address, ip_num, mac_address, device_type, subnet, status, first_seen, created_at, updated_at) VALUES (?,?,inet_aton(?),?,?,?,?,?,?,?) RETURNING * EXCLUDE (ip_num)", (name, ip_address, ip_address, mac_address, device_type, subnet, 'unknown', now, now, now))
+            device = _fetch_one(cur)
+            if device:
+                device_cache.put([device])
+            return device
         except Exception as e:
             logger.error(f"Error creating device: {e}")
             return None
 
     @staticmethod
+    @_device_write
+    def create_devices(records: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Insert many devices in one transaction.
+
+        ``records`` carry ``name``, ``ip_address``, ``device_type`` and
+        optionally ``mac_address`` and ``subnet``. Returns ``(created,
+        conflicts)``; a conflict is ``{"index", "ip_address", "reason"}`` for
+        an address already stored or repeated earlier in ``records``.
+        """
+        conflicts = []
+        fresh = {}
+        for index, r in enumerate(records):
+            if r['ip_address'] in fresh:
+                conflicts.append({"index": index, "ip_address": r['ip_address'], "reason": "duplicate"})
+            else:
+                fresh[r['ip_address']] = index
+        if not fresh:
+            return [], conflicts
+        rows = [records[i] for i in fresh.values()]
+        conn = _conn()
+        try:
+            now = datetime.utcnow()
+            conn.execute("BEGIN TRANSACTION")
+            cur = conn.execute('''
+                INSERT INTO devices (name, ip_address, ip_num, mac_address, device_type, subnet, status, first_seen, created_at, updated_at)
+                SELECT name, ip_address, inet_aton(ip_address), mac_address, device_type, subnet, 'unknown', ?, ?, ?
+                FROM (
+                    SELECT unnest(?::TEXT[]) AS name, unnest(?::TEXT[]) AS ip_address, unnest(?::TEXT[]) AS mac_address,
+                           unnest(?::TEXT[]) AS device_type, unnest(?::TEXT[]) AS subnet
+                )
+                ON CONFLICT (ip_address) DO NOTHING
+                RETURNING * EXCLUDE (ip_num)
+            ''', (
+                now, now, now,
+                [r['name'] for r in rows],
+                [r['ip_address'] for r in rows],
+                [r.get('mac_address') for r in rows],
+                [r['device_type'] for r in rows],
+                [r.get('subnet') for r in rows],
+            ))
+            created = _fetch_dicts(cur)
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            logger.error(f"Error creating {len(rows)} devices: {e}")
+            raise
+        device_cache.put(created)
+        inserted = {d['ip_address'] for d in created}
+        for ip_address, index in fresh.items():
+            if ip_address not in inserted:
+                conflicts.append({"index": index, "ip_address": ip_address, "reason": "exists"})
+        conflicts.sort(key=lambda c: c['index'])
+        return created, conflicts
+
+    @staticmethod
+    @_device_write
     def update_device(device_id: int, data: Dict) -> Optional[Dict]:
         try:
             conn = _conn()
@@ -338,59 +729,125 @@ class Database:
             for k, v in data.items():
                 sets.append(f"{k} = ?")
                 params.append(v)
+                if k == 'ip_address':
+                    sets.append("ip_num = inet_aton(?)")
+                    params.append(v)
             if not sets:
-                conn.close()
                 return Database.get_device(device_id)
-            params.append(datetime.utcnow().isoformat())
+            params.append(datetime.utcnow())
             params.append(device_id)
-            sql = f"UPDATE devices SET {', '.join(sets)}, updated_at = ? WHERE id = ?"
-            conn.execute(sql, tuple(params))
-            df = conn.execute("SELECT * FROM devices WHERE id = ?", (device_id,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            sql = f"UPDATE devices SET {', '.join(sets)}, updated_at = ? WHERE id = ? RETURNING * EXCLUDE (ip_num)"
+            cur = conn.execute(sql, tuple(params))
+            device = _fetch_one(cur)
+            if device:
+                device_cache.put([device])
+            return device
         except Exception as e:
             logger.error(f"Error updating device: {e}")
             return None
 
     @staticmethod
+    @_device_write
     def delete_device(device_id: int) -> bool:
         try:
             conn = _conn()
             conn.execute("DELETE FROM devices WHERE id = ?", (device_id,))
-            conn.close()
+            device_cache.remove(device_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting device: {e}")
             return False
 
     @staticmethod
-    def update_device_status(device_id: int, status: str, latency_ms: Optional[float] = None) -> bool:
+    @_device_write
+    def update_device_status(device_id: int, status: str, latency_ms: Optional[float] = None) -> Optional[Dict]:
+        """Record one probe result and return the updated device.
+
+        The device update, its history row and latency sample share a
+        transaction; a ``latency_ms`` of None keeps the previous latency.
+        """
+        conn = _conn()
         try:
-            conn = _conn()
-            now = datetime.utcnow().isoformat()
-            conn.execute("UPDATE devices SET status = ?, last_seen = ?, updated_at = ? WHERE id = ?", (status, now, now, device_id))
-            if latency_ms is not None:
-                conn.execute("UPDATE devices SET latency_ms = ? WHERE id = ?", (latency_ms, device_id))
-            dsid = Database._next_id('device_status')
-            conn.execute("INSERT INTO device_status (id, device_id, old_status, new_status, reason, changed_at) VALUES (?,?,?,?,?,?)", (dsid, device_id, None, status, None, now))
-            conn.close()
-            return True
+            now = datetime.utcnow()
+            conn.execute("BEGIN TRANSACTION")
+            cur = conn.execute("UPDATE devices SET status = ?, last_seen = ?, updated_at = ?, latency_ms = COALESCE(?, latency_ms) WHERE id = ? RETURNING * EXCLUDE (ip_num)", (status, now, now, latency_ms, device_id))
+            device = _fetch_one(cur)
+            if device:
+                conn.execute("INSERT INTO device_status (device_id, old_status, new_status, reason, changed_at) VALUES (?,?,?,?,?)", (device_id, None, status, None, now))
+                conn.execute("INSERT INTO latency_samples (device_id, sampled_at, rtt_ms, loss) VALUES (?,?,?,?)", (device_id, now, latency_ms, 0.0 if status == 'up' else 1.0))
+            conn.execute("COMMIT")
+            if device:
+                device_cache.put([device])
+            return device
         except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
             logger.error(f"Error updating device status: {e}")
+            return None
+
+    @staticmethod
+    @_device_write
+    def update_device_statuses(updates: List[Tuple[int, str, Optional[float], datetime]]) -> bool:
+        """Apply many ``(device_id, status, latency_ms, observed_at)`` results at once.
+
+        Devices take the last result per id; every result still gets its own
+        history row and latency sample. All three writes share a transaction.
+        """
+        if not updates:
+            return True
+        latest = {u[0]: u for u in updates}
+        conn = _conn()
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            cur = conn.execute('''
+                UPDATE devices SET
+                    status = u.status,
+                    last_seen = u.changed_at,
+                    updated_at = u.changed_at,
+                    latency_ms = COALESCE(u.latency_ms, devices.latency_ms)
+                FROM (
+                    SELECT unnest(?::INTEGER[]) AS device_id, unnest(?::TEXT[]) AS status,
+                           unnest(?::DOUBLE[]) AS latency_ms, unnest(?::TIMESTAMP[]) AS changed_at
+                ) u
+                WHERE devices.id = u.device_id
+                RETURNING devices.* EXCLUDE (ip_num)
+            ''', (
+                [u[0] for u in latest.values()],
+                [u[1] for u in latest.values()],
+                [u[2] for u in latest.values()],
+                [u[3] for u in latest.values()],
+            ))
+            devices = _fetch_dicts(cur)
+            ids = [u[0] for u in updates]
+            statuses = [u[1] for u in updates]
+            conn.execute('''
+                INSERT INTO device_status (device_id, new_status, changed_at)
+                SELECT unnest(?::INTEGER[]), unnest(?::TEXT[]), unnest(?::TIMESTAMP[])
+            ''', (ids, statuses, [u[3] for u in updates]))
+            conn.execute('''
+                INSERT INTO latency_samples (device_id, sampled_at, rtt_ms, loss)
+                SELECT unnest(?::INTEGER[]), unnest(?::TIMESTAMP[]), unnest(?::DOUBLE[]), unnest(?::DOUBLE[])
+            ''', (ids, [u[3] for u in updates], [u[2] for u in updates], [0.0 if st == 'up' else 1.0 for st in statuses]))
+            conn.execute("COMMIT")
+            device_cache.put(devices)
+            return True
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            logger.error(f"Error applying {len(updates)} status updates: {e}")
             return False
 
     @staticmethod
     def create_alert(title: str, description: str, severity: str, device_id: Optional[int] = None, alert_type: Optional[str] = None) -> Optional[Dict]:
         try:
             conn = _conn()
-            now = datetime.utcnow().isoformat()
-            aid = Database._next_id('alerts')
-            conn.execute("INSERT INTO alerts (id, device_id, title, description, severity, alert_type, is_resolved, created_at) VALUES (?,?,?,?,?,?,?,?)", (aid, device_id, title, description, severity, alert_type, 0, now))
-            df = conn.execute("SELECT * FROM alerts ORDER BY created_at DESC LIMIT 1").fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            now = datetime.utcnow()
+            cur = conn.execute("INSERT INTO alerts (device_id, title, description, severity, alert_type, is_resolved, created_at) VALUES (?,?,?,?,?,?,?) RETURNING *", (device_id, title, description, severity, alert_type, 0, now))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error creating alert: {e}")
             return None
@@ -399,81 +856,671 @@ class Database:
     def get_alerts(limit: int = 100) -> List[Dict]:
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM alerts ORDER BY created_at DESC LIMIT ?", (limit,)).fetchdf()
-            conn.close()
-            return _rows_to_dicts(df)
+            cur = conn.execute("SELECT * FROM alerts ORDER BY created_at DESC, id DESC LIMIT ?", (limit,))
+            return _fetch_dicts(cur)
         except Exception as e:
             logger.error(f"Error fetching alerts: {e}")
             return []
 
+    @staticmethod
+    def resolve_alert(alert_id: int) -> bool:
+        try:
+            conn = _conn()
+            conn.execute("UPDATE alerts SET is_resolved = 1, resolved_at = ? WHERE id = ?", (datetime.utcnow(), alert_id))
+            return True
+        except Exception as e:
+            logger.error(f"Error resolving alert: {e}")
+            return False
+
+    @staticmethod
+    def get_device_history(device_id: int, limit: int = 50) -> List[Dict]:
+        try:
+            conn = _conn()
+            # Materializing the filter first lets idx_device_status_device drive
+            # it; a plain ORDER BY ... LIMIT is planned as a full top-N scan.
+            # The view adds rows already moved to the Parquet archive.
+            cur = conn.execute('''
+                WITH history AS MATERIALIZED (SELECT * FROM device_status_history WHERE device_id = ?)
+                SELECT * FROM history ORDER BY changed_at DESC LIMIT ?
+            ''', (device_id, limit))
+            return _fetch_dicts(cur)
+        except Exception as e:
+            logger.error(f"Error fetching device history: {e}")
+            return []
+
     @staticmethod
     def create_scan(scan_type: str, total_devices: int, devices_online: int, duration_ms: int, status: str = 'success', error_message: Optional[str] = None) -> Optional[Dict]:
         try:
             conn = _conn()
-            now = datetime.utcnow().isoformat()
-            sid = Database._next_id('scans')
-            conn.execute("INSERT INTO scans (id, scan_type, total_devices, devices_online, duration_ms, status, error_message, scanned_at, created_at) VALUES (?,?,?,?,?,?,?,?,?)", (sid, scan_type, total_devices, devices_online, duration_ms, status, error_message, now, now))
-            df = conn.execute("SELECT * FROM scans ORDER BY scanned_at DESC LIMIT 1").fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            now = datetime.utcnow()
+            cur = conn.execute("INSERT INTO scans (scan_type, total_devices, devices_online, duration_ms, status, error_message, scanned_at, created_at) VALUES (?,?,?,?,?,?,?,?) RETURNING *", (scan_type, total_devices, devices_online, duration_ms, status, error_message, now, now))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error creating scan record: {e}")
             return None
 
     @staticmethod
-    def create_subnet_scan(subnet: str, interface_name: str, total_devices: int, devices_discovered: int, duration_ms: int, status: str = 'success', error_message: Optional[str] = None) -> Optional[Dict]:
+    def create_subnet_scan(subnet: str, interface_name: str, total_devices: int, devices_discovered: int, duration_ms: int, status: str = 'success', error_message: Optional[str] = None, full_sweep: bool = False) -> Optional[Dict]:
         try:
             conn = _conn()
-            now = datetime.utcnow().isoformat()
-            sid = Database._next_id('subnet_scans')
-            conn.execute("INSERT INTO subnet_scans (id, subnet, interface_name, total_devices, devices_discovered, duration_ms, status, error_message, scanned_at, created_at) VALUES (?,?,?,?,?,?,?,?,?,?)", (sid, subnet, interface_name, total_devices, devices_discovered, duration_ms, status, error_message, now, now))
-            df = conn.execute("SELECT * FROM subnet_scans WHERE id = ?", (sid,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+            now = datetime.utcnow()
+            cur = conn.execute("INSERT INTO subnet_scans (subnet, interface_name, total_devices, devices_discovered, duration_ms, status, error_message, scanned_at, created_at, full_sweep) VALUES (?,?,?,?,?,?,?,?,?,?) RETURNING *", (subnet, interface_name, total_devices, devices_discovered, duration_ms, status, error_message, now, now, full_sweep))
+            return _fetch_one(cur)
         except Exception as e:
             logger.error(f"Error creating subnet scan record: {e}")
             return None
 
+    @staticmethod
+    def get_last_full_sweep(subnet: str) -> Optional[datetime]:
+        """When ``subnet`` was last swept end to end, or None if never."""
+        try:
+            conn = _conn()
+            return conn.execute("SELECT MAX(scanned_at) FROM subnet_scans WHERE subnet = ? AND full_sweep AND status = 'success'", (subnet,)).fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error fetching last full sweep: {e}")
+            return None
+
     @staticmethod
     def get_subnet_scans(limit: int = 50) -> List[Dict]:
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM subnet_scans ORDER BY scanned_at DESC LIMIT ?", (limit,)).fetchdf()
-            conn.close()
-            return _rows_to_dicts(df)
+            cur = conn.execute("SELECT * FROM subnet_scans ORDER BY scanned_at DESC LIMIT ?", (limit,))
+            return _fetch_dicts(cur)
         except Exception as e:
             logger.error(f"Error fetching subnet scans: {e}")
             return []
 
+    @staticmethod
+    def get_device_summary() -> Dict:
+        """Device totals by status and the mean of non-zero latencies."""
+        try:
+            conn = _conn()
+            cur = conn.execute('''
+                SELECT COUNT(*) AS total,
+                       COUNT(*) FILTER (WHERE status = 'up') AS up,
+                       COUNT(*) FILTER (WHERE status = 'down') AS down,
+                       COALESCE(AVG(latency_ms) FILTER (WHERE latency_ms <> 0), 0) AS avg_latency
+                FROM devices
+            ''')
+            return _fetch_one(cur)
+        except Exception as e:
+            logger.error(f"Error summarizing devices: {e}")
+            return {"total": 0, "up": 0, "down": 0, "avg_latency": 0}
+
+    @staticmethod
+    def get_subnet_summary() -> List[Dict]:
+        """Per-subnet device and online counts plus mean latency.
+
+        Devices without a latency count as 0 ms in ``avg_latency``.
+        """
+        try:
+            conn = _conn()
+            cur = conn.execute('''
+                SELECT subnet,
+                       COUNT(*) AS device_count,
+                       COUNT(*) FILTER (WHERE status = 'up') AS online_count,
+                       COALESCE(SUM(latency_ms), 0) / COUNT(*) AS avg_latency
+                FROM devices
+                GROUP BY subnet
+                ORDER BY subnet NULLS LAST
+            ''')
+            return _fetch_dicts(cur)
+        except Exception as e:
+            logger.error(f"Error summarizing subnets: {e}")
+            return []
+
+    @staticmethod
+    def get_alert_summary() -> Dict:
+        try:
+            conn = _conn()
+            cur = conn.execute('''
+                SELECT COUNT(*) AS total,
+                       COUNT(*) FILTER (WHERE severity = 'critical') AS critical,
+                       COUNT(*) FILTER (WHERE severity = 'warning') AS warning
+                FROM alerts
+            ''')
+            return _fetch_one(cur)
+        except Exception as e:
+            logger.error(f"Error summarizing alerts: {e}")
+            return {"total": 0, "critical": 0, "warning": 0}
+
     @staticmethod
     def get_devices_by_subnet(subnet: str) -> List[Dict]:
         try:
             conn = _conn()
-            df = conn.execute("SELECT * FROM devices WHERE subnet = ? ORDER BY ip_address", (subnet,)).fetchdf()
-            conn.close()
-            return _rows_to_dicts(df)
+            bounds = _ipv4_range(subnet)
+            if bounds:
+                cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices WHERE ip_num BETWEEN ? AND ? ORDER BY ip_num", bounds)
+            else:
+                cur = conn.execute("SELECT * EXCLUDE (ip_num) FROM devices WHERE subnet = ? ORDER BY ip_num", (subnet,))
+            return _fetch_dicts(cur)
         except Exception as e:
             logger.error(f"Error fetching devices by subnet: {e}")
             return []
 
     @staticmethod
+    @_device_write
     def upsert_device_from_scan(ip_address: str, mac_address: Optional[str], device_type: str, subnet: str, latency_ms: Optional[float] = None) -> Optional[Dict]:
         try:
             existing = Database.get_device_by_ip(ip_address)
-            now = datetime.utcnow().isoformat()
+            now = datetime.utcnow()
             conn = _conn()
             if existing:
-                conn.execute("UPDATE devices SET status = ?, last_seen = ?, updated_at = ?, latency_ms = ? WHERE ip_address = ?", ('up', now, now, latency_ms, ip_address))
+                cur = conn.execute("UPDATE devices SET status = ?, last_seen = ?, updated_at = ?, latency_ms = ? WHERE ip_address = ? RETURNING * EXCLUDE (ip_num)", ('up', now, now, latency_ms, ip_address))
             else:
                 name = f"Device-{ip_address.split('.')[-1]}"
-                did = Database._next_id('devices')
-                conn.execute("INSERT INTO devices (id, name, ip_address, mac_address, device_type, subnet, status, latency_ms, first_seen, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?,?,?)", (did, name, ip_address, mac_address, device_type, subnet, 'up', latency_ms, now, now, now))
-            df = conn.execute("SELECT * FROM devices WHERE ip_address = ?", (ip_address,)).fetchdf()
-            conn.close()
-            rows = _rows_to_dicts(df)
-            return rows[0] if rows else None
+                cur = conn.execute("INSERT INTO devices (name, ip_address, ip_num, mac_address, device_type, subnet, status, latency_ms, first_seen, created_at, updated_at) VALUES (?,?,inet_aton(?),?,?,?,?,?,?,?,?) RETURNING * EXCLUDE (ip_num)", (name, ip_address, ip_address, mac_address, device_type, subnet, 'up', latency_ms, now, now, now))
+            device = _fetch_one(cur)
+            if device:
+                device_cache.put([device])
+            return device
         except Exception as e:
             logger.error(f"Error upserting device from scan: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    @_device_write
+    def upsert_devices_from_scan(records: List[Dict]) -> List[Dict]:
+        """Merge a whole scan result set into ``devices`` in one statement.
+
+        Each record carries ``ip_address``, ``mac_address``, ``device_type``,
+        ``subnet``, ``latency_ms``, ``interface_name`` and ``open_ports``
+        (None when the host was not port-probed). New addresses are
+        inserted, known ones are marked up and keep their latency, MAC,
+        interface and open ports unless the record has them; the merged rows
+        are returned. Records without latency (ARP or neighbor-table hits)
+        add no latency sample.
+        """
+        if not records:
+            return []
+        # ON CONFLICT cannot touch the same row twice in one command
+        by_ip = {r['ip_address']: r for r in records}
+        columns = ('ip_address', 'mac_address', 'device_type', 'subnet', 'latency_ms', 'interface_name', 'open_ports')
+        # pandas is only needed to stage bulk writes, keep it off the import path
+        import pandas as pd
+
+        batch = pd.DataFrame([{c: r.get(c) for c in columns} for r in by_ip.values()], columns=columns)
+        batch['latency_ms'] = batch['latency_ms'].astype('float64')
+        now = datetime.utcnow()
+        conn = _conn()
+        try:
+            conn.register('_scan_batch', batch)
+            conn.execute("BEGIN TRANSACTION")
+            cur = conn.execute('''
+                INSERT INTO devices (name, ip_address, ip_num, mac_address, device_type, subnet, interface_name, open_ports, status, latency_ms, first_seen, last_seen, created_at, updated_at)
+                SELECT 'Device-' || split_part(ip_address, '.', 4), ip_address, inet_aton(ip_address), CAST(mac_address AS TEXT), CAST(device_type AS TEXT),
+                       CAST(subnet AS TEXT), CAST(interface_name AS TEXT), CAST(open_ports AS INTEGER[]), 'up', latency_ms, ?, ?, ?, ?
+                FROM _scan_batch
+                ON CONFLICT (ip_address) DO UPDATE SET
+                    status = 'up',
+                    last_seen = excluded.last_seen,
+                    updated_at = excluded.updated_at,
+                    latency_ms = COALESCE(excluded.latency_ms, devices.latency_ms),
+                    mac_address = COALESCE(excluded.mac_address, devices.mac_address),
+                    interface_name = COALESCE(excluded.interface_name, devices.interface_name),
+                    open_ports = COALESCE(excluded.open_ports, devices.open_ports)
+                RETURNING * EXCLUDE (ip_num)
+            ''', (now, now, now, now))
+            rows = _fetch_dicts(cur)
+            conn.execute('''
+                INSERT INTO latency_samples (device_id, sampled_at, rtt_ms, loss)
+                SELECT d.id, ?, b.latency_ms, 0.0
+                FROM _scan_batch b JOIN devices d ON d.ip_address = b.ip_address
+                WHERE b.latency_ms IS NOT NULL
+            ''', (now,))
+            conn.execute("COMMIT")
+            device_cache.put(rows)
+            return rows
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            logger.error(f"Error bulk upserting {len(by_ip)} scanned devices: {e}", exc_info=True)
+            return []
+        finally:
+            try:
+                conn.unregister('_scan_batch')
+            except Exception:
+                pass
+
+    @staticmethod
+    def rollup_latency() -> bool:
+        """Refresh the 1m/1h/1d latency aggregates from raw samples.
+
+        Each resolution only re-aggregates samples from one bucket before its
+        newest rolled-up bucket, so a run costs the tail of the samples table
+        rather than all of it. Late samples within that window are picked up.
+        """
+        try:
+            conn = _conn()
+            for resolution, (unit, width) in LATENCY_RESOLUTIONS.items():
+                latest = conn.execute("SELECT MAX(bucket_start) FROM latency_rollups WHERE resolution = ?", (resolution,)).fetchone()[0]
+                since = latest - width if latest else datetime.min
+                conn.execute(f'''
+                    INSERT INTO latency_rollups
+                    SELECT ?, device_id, date_trunc('{unit}', sampled_at) AS bucket_start,
+                           COUNT(*), COUNT(rtt_ms), MIN(rtt_ms), AVG(rtt_ms), MAX(rtt_ms),
+                           quantile_cont(rtt_ms, 0.95), AVG(loss)
+                    FROM latency_samples
+                    WHERE sampled_at >= ?
+                    GROUP BY device_id, bucket_start
+                    ON CONFLICT (resolution, device_id, bucket_start) DO UPDATE SET
+                        samples = excluded.samples,
+                        rtt_samples = excluded.rtt_samples,
+                        rtt_min = excluded.rtt_min,
+                        rtt_avg = excluded.rtt_avg,
+                        rtt_max = excluded.rtt_max,
+                        rtt_p95 = excluded.rtt_p95,
+                        loss_avg = excluded.loss_avg
+                ''', (resolution, since))
+            return True
+        except Exception as e:
+            logger.error(f"Error rolling up latency samples: {e}")
+            return False
+
+    @staticmethod
+    def prune_latency_samples(days: int = LATENCY_RETENTION_DAYS) -> int:
+        try:
+            conn = _conn()
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            return conn.execute("DELETE FROM latency_samples WHERE sampled_at < ?", (cutoff,)).fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error pruning latency samples: {e}")
+            return 0
+
+    @staticmethod
+    def archive_history(days: int = HISTORY_RETENTION_DAYS) -> Dict[str, int]:
+        """Move history older than ``days`` into day-partitioned Parquet files.
+
+        Rows are appended under ``ARCHIVE_DIR/<table>/day=YYYY-MM-DD/`` and
+        then deleted from the live table, after which a CHECKPOINT hands the
+        freed blocks back. Partitions that now hold more than one file are
+        rewritten into one (see :func:`_compact_partition`). Archived rows
+        stay queryable through the ``device_status_history`` and
+        ``alerts_history`` views. Returns the number of rows moved per table.
+
+        The Parquet write is not part of the database transaction: if the
+        DELETE fails, the rows are both archived and live, and the history
+        views show them twice until the next run. That run skips ids already
+        in the archive and only deletes them, so nothing is archived twice.
+        """
+        conn = _conn()
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        moved = {}
+        for table, (column, condition) in _ARCHIVE_TABLES.items():
+            where = f"WHERE {column} < ? {condition}"
+            try:
+                conn.execute("BEGIN TRANSACTION")
+                count = conn.execute(f"SELECT COUNT(*) FROM {table} {where}", (cutoff,)).fetchone()[0]
+                if count:
+                    target = Path(ARCHIVE_DIR) / table
+                    target.mkdir(parents=True, exist_ok=True)
+                    copy_where = where
+                    # Rows an earlier, failed run archived without deleting
+                    days = conn.execute(f"SELECT DISTINCT CAST({column} AS DATE) FROM {table} {where}", (cutoff,)).fetchall()
+                    archived = [str(target / f"day={day}" / '*.parquet').replace("'", "''")
+                                for (day,) in days if any((target / f"day={day}").glob('*.parquet'))]
+                    if archived:
+                        sources = ', '.join(f"'{a}'" for a in archived)
+                        copy_where += f" AND id NOT IN (SELECT id FROM read_parquet([{sources}], union_by_name = true))"
+                    conn.execute(f'''
+                        COPY (SELECT *, CAST({column} AS DATE) AS day FROM {table} {copy_where})
+                        TO '{str(target).replace("'", "''")}' (FORMAT PARQUET, PARTITION_BY (day), APPEND)
+                    ''', (cutoff,))
+                    conn.execute(f"DELETE FROM {table} {where}", (cutoff,))
+                conn.execute("COMMIT")
+                moved[table] = count
+            except Exception as e:
+                try:
+                    conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+                logger.error(f"Error archiving {table}: {e}")
+                moved[table] = 0
+            for partition in sorted((Path(ARCHIVE_DIR) / table).glob('day=*')):
+                try:
+                    _compact_partition(conn, partition)
+                except Exception as e:
+                    logger.error(f"Error compacting {partition}: {e}")
+        try:
+            _refresh_history_views(conn)
+            if any(moved.values()):
+                conn.execute("CHECKPOINT")
+                logger.info(f"Archived history rows: {moved}")
+        except Exception as e:
+            logger.error(f"Error refreshing history archive: {e}")
+        return moved
+
+    @staticmethod
+    def get_latency_rollups(resolution: str, days: int) -> List[Dict]:
+        """Fleet-wide series for the last ``days`` at one rollup resolution.
+
+        Device buckets are combined per timestamp: avg is weighted by sample
+        count and p95 is the worst per-device p95 in the bucket.
+        """
+        try:
+            conn = _conn()
+            since = datetime.utcnow() - timedelta(days=days)
+            cur = conn.execute('''
+                SELECT bucket_start,
+                       MIN(rtt_min) AS rtt_min,
+                       SUM(rtt_avg * rtt_samples) / NULLIF(SUM(rtt_samples), 0) AS rtt_avg,
+                       MAX(rtt_max) AS rtt_max,
+                       MAX(rtt_p95) AS rtt_p95,
+                       SUM(loss_avg * samples) / SUM(samples) AS loss_avg
+                FROM latency_rollups
+                WHERE resolution = ? AND bucket_start >= ?
+                GROUP BY bucket_start
+                ORDER BY bucket_start
+            ''', (resolution, since))
+            return _fetch_dicts(cur)
+        except Exception as e:
+            logger.error(f"Error fetching latency rollups: {e}")
+            return []
+
+
+def _archive_glob(table: str) -> str:
+    return str(Path(ARCHIVE_DIR) / table / '*' / '*.parquet').replace("'", "''")
+
+
+def _compact_partition(conn, partition: Path):
+    """Rewrite the Parquet files of one archive partition as a single file.
+
+    The merged file is written under a name the archive glob skips and
+    then moved over the first file, so readers see either the old files or
+    the merged one. The others are removed afterwards; an interruption in
+    between can leave rows duplicated, never missing.
+    """
+    files = sorted(partition.glob('*.parquet'))
+    if len(files) < 2:
+        return
+    sources = ', '.join("'" + str(f).replace("'", "''") + "'" for f in files)
+    merged = partition / 'compacting.tmp'
+    conn.execute(f'''
+        COPY (SELECT * FROM read_parquet([{sources}], union_by_name = true))
+        TO '{str(merged).replace("'", "''")}' (FORMAT PARQUET)
+    ''')
+    os.replace(merged, files[0])
+    for f in files[1:]:
+        f.unlink()
+
+
+def _refresh_history_views(conn):
+    """(Re)create ``<table>_history`` views: live rows plus archived Parquet."""
+    for table in _ARCHIVE_TABLES:
+        if any((Path(ARCHIVE_DIR) / table).glob('*/*.parquet')):
+            conn.execute(f'''
+                CREATE OR REPLACE VIEW {table}_history AS
+                SELECT * FROM {table}
+                UNION ALL BY NAME
+                SELECT * EXCLUDE (day) FROM read_parquet('{_archive_glob(table)}', hive_partitioning = true, union_by_name = true)
+            ''')
+        else:
+            conn.execute(f"CREATE OR REPLACE VIEW {table}_history AS SELECT * FROM {table}")
+
+
+class DeviceCache:
+    """Write-through copy of the devices table, indexed by id, IP and MAC.
+
+    Loaded by :meth:`Database.init` and updated by every ``Database`` method
+    that changes a device, after its statement has committed. ``generation``
+    increases on every change so readers can tell whether data they hold is
+    stale. Reads return copies; rows inside the cache are never handed out.
+    The cache only answers for the database it was loaded from; when
+    ``DB_PATH`` changes, reads fall back to SQL until the next load.
+
+    Writers hold ``lock`` from their statement until the cache is updated
+    (see ``_device_write``) so rows reach the cache in commit order.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._by_id: Dict[int, Dict] = {}
+        self._by_ip: Dict[str, int] = {}
+        self._by_mac: Dict[str, set] = {}
+        self._ordered: Optional[List[Dict]] = None
+        self._path: Optional[str] = None
+        self.generation = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._path == DB_PATH
+
+    def load(self, rows: List[Dict]):
+        with self.lock:
+            self._by_id.clear()
+            self._by_ip.clear()
+            self._by_mac.clear()
+            for row in rows:
+                self._index(row)
+            self._path = DB_PATH
+            self._changed()
+
+    def put(self, rows: List[Dict]):
+        if not rows:
+            return
+        with self.lock:
+            if not self.ready:
+                return
+            for row in rows:
+                current = self._by_id.get(row['id'])
+                if current:
+                    self._unindex(current)
+                self._index(dict(row))
+            self._changed()
+
+    def remove(self, device_id: int):
+        with self.lock:
+            current = self._by_id.get(device_id)
+            if current:
+                self._unindex(current)
+                self._changed()
+
+    def get(self, device_id: int) -> Optional[Dict]:
+        row = self._by_id.get(device_id)
+        return dict(row) if row else None
+
+    def get_by_ip(self, ip_address: str) -> Optional[Dict]:
+        device_id = self._by_ip.get(ip_address)
+        return self.get(device_id) if device_id is not None else None
+
+    def get_by_mac(self, mac_address: str) -> Optional[Dict]:
+        """Most recently seen device with this MAC (several can share one)."""
+        with self.lock:
+            rows = [self._by_id[i] for i in self._by_mac.get(mac_address.lower(), ())]
+        if not rows:
+            return None
+        return dict(max(rows, key=lambda r: (r.get('last_seen') is not None, r.get('last_seen') or datetime.min)))
+
+    def snapshot(self, limit: Optional[int] = None) -> Tuple[int, List[Dict]]:
+        """``(generation, devices newest first)``, as ``get_devices`` orders them."""
+        with self.lock:
+            if self._ordered is None:
+                # ORDER BY created_at DESC puts NULLs last
+                self._ordered = sorted(self._by_id.values(), key=lambda r: (r.get('created_at') is not None, r.get('created_at') or datetime.min), reverse=True)
+            generation, ordered = self.generation, self._ordered
+        if limit:
+            ordered = ordered[:limit]
+        return generation, [dict(r) for r in ordered]
+
+    def _index(self, row: Dict):
+        self._by_id[row['id']] = row
+        if row.get('ip_address'):
+            self._by_ip[row['ip_address']] = row['id']
+        if row.get('mac_address'):
+            self._by_mac.setdefault(row['mac_address'].lower(), set()).add(row['id'])
+
+    def _unindex(self, row: Dict):
+        self._by_id.pop(row['id'], None)
+        if self._by_ip.get(row.get('ip_address')) == row['id']:
+            del self._by_ip[row['ip_address']]
+        if row.get('mac_address'):
+            ids = self._by_mac.get(row['mac_address'].lower())
+            if ids:
+                ids.discard(row['id'])
+                if not ids:
+                    del self._by_mac[row['mac_address'].lower()]
+
+    def _changed(self):
+        self._ordered = None
+        self.generation += 1
+
+
+device_cache = DeviceCache()
+
+
+class StatusWriter:
+    """Write-behind queue for device status results.
+
+    Probe threads call :meth:`submit` and return immediately; a single
+    background thread drains the bounded queue and applies results through
+    :meth:`Database.update_device_statuses` every ``flush_interval`` seconds
+    or ``batch_size`` results, whichever comes first. When the queue is full
+    ``submit`` blocks, which pushes back on the probers instead of growing
+    memory without bound; coroutines use :meth:`submit_async`, which waits
+    for space in a worker thread rather than on the event loop.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 1000, flush_interval: float = 0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._submitted = 0
+        self._written = 0
+        self._failed = 0
+        self._flushes = 0
+        self._flush_ms_total = 0.0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+
+    def start(self):
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, device_id: int, status: str, latency_ms: Optional[float] = None, timeout: Optional[float] = None) -> bool:
+        """Queue one probe result; False if the queue stayed full past ``timeout``."""
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        try:
+            self._queue.put((device_id, status, latency_ms, datetime.utcnow()), timeout=timeout)
+        except queue.Full:
+            logger.warning(f"Status writer queue full, dropped update for device {device_id}")
+            return False
+        with self.lock:
+            self._submitted += 1
+        return True
+
+    async def submit_async(self, device_id: int, status: str, latency_ms: Optional[float] = None,
+                           timeout: Optional[float] = None) -> bool:
+        """:meth:`submit` for coroutines; never blocks the event loop."""
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        item = (device_id, status, latency_ms, datetime.utcnow())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Keep the backpressure, but wait for space off the loop
+            try:
+                await asyncio.to_thread(self._queue.put, item, True, timeout)
+            except queue.Full:
+                logger.warning(f"Status writer queue full, dropped update for device {device_id}")
+                return False
+        with self.lock:
+            self._submitted += 1
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything submitted so far has been written."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending results and stop the writer thread."""
+        if not self._thread:
+            return
+        self._stopping.set()
+        self.flush(timeout)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "submitted": self._submitted,
+                "written": self._written,
+                "failed": self._failed,
+                "flushes": self._flushes,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "avg_flush_ms": round(self._flush_ms_total / self._flushes, 2) if self._flushes else 0.0,
+                "max_flush_ms": round(self._max_flush_ms, 2),
+            }
+
+    def _run(self):
+        while True:
+            batch = []
+            waiters = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    # flush() barrier: write what we have now, then release it
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for w in waiters:
+                w.set()
+            if self._stopping.is_set() and self._queue.empty():
+                return
+
+    def _write(self, batch: List[Tuple]):
+        if not batch:
+            return
+        start = time.perf_counter()
+        ok = Database.update_device_statuses(batch)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self._flushes += 1
+            self._flush_ms_total += elapsed
+            self._last_flush_ms = elapsed
+            self._max_flush_ms = max(self._max_flush_ms, elapsed)
+            if ok:
+                self._written += len(batch)
+            else:
+                self._failed += len(batch)
+
+
+status_writer = StatusWriter(
+    max_queue=int(os.environ.get('STATUS_WRITER_QUEUE', '10000')),
+    flush_interval=float(os.environ.get('STATUS_WRITER_FLUSH_INTERVAL', '0.5')),
+)
@@ -0,0 +1,443 @@
+"""
+ICMP Echo Engine
+In-process asyncio ping over unprivileged datagram or raw ICMP sockets
+"""
+
+import asyncio
+import errno
+import functools
+import logging
+import os
+import random
+import socket
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+# Echo requests allowed in flight per engine; bounds socket buffer use
+ICMP_MAX_IN_FLIGHT = int(os.environ.get('ICMP_MAX_IN_FLIGHT', '2048'))
+
+# Extra echo requests a sweep sends to an address that has not answered
+ICMP_RETRIES = int(os.environ.get('ICMP_RETRIES', '2'))
+
+# Probe timeout bounds in seconds (nmap's --min/--initial-rtt-timeout)
+RTT_MIN_TIMEOUT = float(os.environ.get('RTT_MIN_TIMEOUT', '0.1'))
+RTT_INITIAL_TIMEOUT = float(os.environ.get('RTT_INITIAL_TIMEOUT', '1.0'))
+
+_PAYLOAD = b'netmon-icmp-echo'
+
+# How long a send waits for buffer space before the probe is given up
+_SEND_BUFFER_WAIT = 1.0
+
+
+def checksum(data: bytes) -> int:
+    """RFC 1071 internet checksum"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = _PAYLOAD) -> bytes:
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum(header + payload), ident, seq) + payload
+
+
+def parse_echo_reply(packet: bytes, has_ip_header: bool) -> Optional[Tuple[int, int]]:
+    """``(ident, seq)`` of an echo reply, or None for any other packet.
+
+    Raw sockets deliver the IPv4 header in front of the ICMP message;
+    datagram sockets deliver the ICMP message alone.
+    """
+    if has_ip_header:
+        if len(packet) < 20:
+            return None
+        packet = packet[(packet[0] & 0x0f) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, code, _, ident, seq = struct.unpack('!BBHHH', packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY or code != 0:
+        return None
+    return ident, seq
+
+
+# Classic BPF opcodes (linux/filter.h) and SO_ATTACH_FILTER (asm-generic/socket.h)
+_BPF_LDX_B_MSH = 0xb1
+_BPF_LD_B_IND = 0x50
+_BPF_LD_H_IND = 0x48
+_BPF_JEQ_K = 0x15
+_BPF_RET_K = 0x06
+_SO_ATTACH_FILTER = 26
+
+
+def attach_reply_filter(sock: socket.socket, ident: int) -> bool:
+    """Make a raw ICMP socket drop everything but echo replies carrying ``ident``.
+
+    A raw socket is handed a copy of every ICMP packet the host receives.
+    Without this filter each engine (and each worker process) would parse the
+    replies to all the others. Returns False where socket filters are not
+    supported; the identifier check in Python still applies then.
+    """
+    program = [
+        (_BPF_LDX_B_MSH, 0, 0, 0),      # X = IPv4 header length
+        (_BPF_LD_B_IND, 0, 0, 0),       # A = ICMP type
+        (_BPF_JEQ_K, 0, 3, ICMP_ECHO_REPLY),
+        (_BPF_LD_H_IND, 0, 0, 4),       # A = ICMP identifier
+        (_BPF_JEQ_K, 0, 1, ident),
+        (_BPF_RET_K, 0, 0, 0xffff),     # accept
+        (_BPF_RET_K, 0, 0, 0),          # drop
+    ]
+    try:
+        import ctypes
+        code = ctypes.create_string_buffer(b''.join(struct.pack('HBBI', *insn) for insn in program))
+        fprog = struct.pack('HL', len(program), ctypes.addressof(code))
+        sock.setsockopt(socket.SOL_SOCKET, _SO_ATTACH_FILTER, fprog)
+        return True
+    except (OSError, ImportError, struct.error) as e:
+        logger.debug(f"Could not attach ICMP socket filter: {e}")
+        return False
+
+
+def open_icmp_socket() -> Tuple[socket.socket, bool]:
+    """Open a non-blocking ICMP socket: ``(sock, is_raw)``.
+
+    Prefers an unprivileged datagram socket (Linux, allowed by
+    ``net.ipv4.ping_group_range``) and falls back to a raw socket, which needs
+    CAP_NET_RAW. Raises OSError when neither is permitted.
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        is_raw = False
+    except OSError:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        is_raw = True
+    sock.setblocking(False)
+    return sock, is_raw
+
+
+class RttEstimator:
+    """Smoothed RTT and variance, turned into a probe timeout.
+
+    Follows RFC 6298 (and nmap's timing model): the timeout is
+    ``srtt + 4 * rttvar`` clamped to ``[minimum, maximum]``, and ``initial``
+    until the first sample. All values are seconds.
+    """
+
+    def __init__(self, maximum: float = 10.0, minimum: float = RTT_MIN_TIMEOUT,
+                 initial: float = RTT_INITIAL_TIMEOUT):
+        self.minimum = min(minimum, maximum)
+        self.maximum = maximum
+        self.initial = min(initial, maximum)
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+
+    def observe(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    @property
+    def timeout(self) -> float:
+        if self.srtt is None:
+            return self.initial
+        return max(self.minimum, min(self.maximum, self.srtt + 4 * self.rttvar))
+
+
+class IcmpEngine:
+    """Sends echo requests from one socket and matches replies to waiters.
+
+    Replies are matched on ``(source address, sequence)``. A datagram socket
+    only receives replies to its own requests because the kernel owns the
+    identifier. A raw socket sees every ICMP packet on the host, so replies
+    are also filtered on the engine's random identifier. RTTs come from
+    ``time.monotonic()`` taken right after send and on receipt.
+
+    Use as ``async with IcmpEngine() as engine``, inside one event loop.
+    Concurrent sweeps on one engine share its in-flight cap and ``rate``, a
+    packets-per-second limit.
+    """
+
+    def __init__(self, max_in_flight: int = ICMP_MAX_IN_FLIGHT, rate: Optional[TokenBucket] = None):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        # Sweep probes awaiting a reply, across every ping_stream()
+        self.in_flight = 0
+        self.ident = random.randrange(1, 0xffff)
+        self.is_raw = False
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._seq = random.randrange(0, 0x10000)
+
+    async def __aenter__(self) -> 'IcmpEngine':
+        self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def open(self):
+        self._loop = asyncio.get_running_loop()
+        self._sock, self.is_raw = open_icmp_socket()
+        # Large bursts of replies overflow the default receive buffer, and
+        # requests parked in the kernel waiting for ARP hold send buffer
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                self._sock.setsockopt(socket.SOL_SOCKET, option, 4 * 1024 * 1024)
+            except OSError:
+                pass
+        if self.is_raw:
+            attach_reply_filter(self._sock, self.ident)
+        self._loop.add_reader(self._sock.fileno(), self._on_readable)
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        for task in self._tasks:
+            task.cancel()
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.cancel()
+        self._pending.clear()
+
+    async def ping_many(self, ips: Iterable[str], timeout: float = 1.0) -> Dict[str, Optional[float]]:
+        return {ip: rtt async for ip, rtt in self.ping_stream(ips, timeout)}
+
+    async def ping_stream(self, ips: Iterable[str], timeout: float = 1.0, retries: int = ICMP_RETRIES,
+                          timing: Optional[RttEstimator] = None, max_time: Optional[float] = None,
+                          batch: int = 64) -> AsyncIterator[Tuple[str, Optional[float]]]:
+        """Sweep ``ips``: ``(ip, rtt_ms or None)`` for every address, in completion order.
+
+        Probes expire after ``timing.timeout``, which adapts to the RTTs seen
+        so far in this sweep (or an earlier one, when ``timing`` is reused),
+        so dead hosts cost a few LAN round trips rather than a fixed wait.
+        ``timeout`` caps it. Only unanswered addresses are probed again, up
+        to ``retries`` more times; a late reply to an earlier probe still
+        counts. Addresses left after ``max_time`` seconds are reported dead.
+
+        Probes go out ``batch`` at a time with a pass through the event loop
+        in between, so the consumer sees early replies during a large sweep.
+        """
+        ips = list(dict.fromkeys(ips))
+        timing = timing or RttEstimator(maximum=timeout)
+        deadline = time.monotonic() + max_time if max_time is not None else None
+        results: asyncio.Queue = asyncio.Queue()
+        wake = asyncio.Event()
+        unresolved = set(ips)
+        to_send = deque(ips)
+        attempts: Dict[str, int] = {}
+        # Latest probe per address, oldest first: the expiry scan stops early
+        outstanding: Dict[str, float] = {}
+        keys: Dict[str, list] = {}
+
+        def resolve(ip: str, rtt: Optional[float]):
+            if ip not in unresolved:
+                return
+            unresolved.discard(ip)
+            if outstanding.pop(ip, None) is not None:
+                self.in_flight -= 1
+            for key in keys.pop(ip, ()):
+                fut = self._pending.pop(key, None)
+                if fut is not None and not fut.done():
+                    fut.cancel()
+            results.put_nowait((ip, rtt))
+            wake.set()
+
+        def on_reply(ip: str, sent: float, fut: asyncio.Future):
+            if fut.cancelled() or ip not in unresolved:
+                return
+            rtt = max(fut.result() - sent, 0.0)
+            timing.observe(rtt)
+            resolve(ip, rtt * 1000)
+
+        async def probe(ip: str):
+            self._seq = (self._seq + 1) & 0xffff
+            key = (ip, self._seq)
+            fut = self._loop.create_future()
+            self._pending[key] = fut
+            keys.setdefault(ip, []).append(key)
+            try:
+                sent = await self._send(build_echo_request(self.ident, self._seq), ip)
+            except OSError as e:
+                logger.debug(f"ICMP send to {ip} failed: {e}")
+                resolve(ip, None)
+                return
+            attempts[ip] = attempts.get(ip, 0) + 1
+            outstanding[ip] = sent
+            self.in_flight += 1
+            fut.add_done_callback(functools.partial(on_reply, ip, sent))
+
+        async def drive():
+            try:
+                await sweep()
+            finally:
+                for ip in list(unresolved):
+                    resolve(ip, None)
+
+        async def sweep():
+            while unresolved:
+                # Take in queued replies first: after the loop was busy they
+                # may be sitting in the socket while their probes look expired
+                self._on_readable()
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return
+                expiry = timing.timeout
+                for ip, sent in list(outstanding.items()):
+                    if now - sent < expiry:
+                        break
+                    del outstanding[ip]
+                    self.in_flight -= 1
+                    if attempts[ip] <= retries:
+                        to_send.append(ip)
+                    else:
+                        resolve(ip, None)
+                sent_now = 0
+                while to_send and sent_now < batch and self.in_flight < self.max_in_flight:
+                    ip = to_send.popleft()
+                    if ip in unresolved:
+                        await probe(ip)
+                        sent_now += 1
+                if to_send and self.in_flight < self.max_in_flight:
+                    await asyncio.sleep(0)
+                    continue
+                # Sleep until a reply arrives or the oldest probe expires
+                wait = next(iter(outstanding.values())) + expiry - now if outstanding else expiry
+                if to_send:
+                    # Other sweeps on this engine free capacity without waking us
+                    wait = min(wait, 0.005)
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), min(max(wait, 0.001), 0.05))
+                except asyncio.TimeoutError:
+                    pass
+
+        driver = asyncio.ensure_future(drive())
+        self._tasks.add(driver)
+        driver.add_done_callback(self._tasks.discard)
+        try:
+            for _ in range(len(ips)):
+                yield await results.get()
+        finally:
+            driver.cancel()
+            self.in_flight -= len(outstanding)
+            outstanding.clear()
+            for ip in list(unresolved):
+                for key in keys.pop(ip, ()):
+                    self._pending.pop(key, None)
+
+    async def _send(self, packet: bytes, ip: str) -> float:
+        """Send one request and return its monotonic send time.
+
+        A sweep schedules every ping in the same loop iteration, so the
+        reader callback would only run after the whole burst is sent and
+        early replies would carry the burst's duration in their RTT. Draining
+        the socket after each send stamps them as they arrive.
+        """
+        if self.rate is not None:
+            await self.rate.take()
+        give_up = time.monotonic() + _SEND_BUFFER_WAIT
+        while True:
+            try:
+                self._sock.sendto(packet, (ip, 0))
+                sent = time.monotonic()
+                self._on_readable()
+                return sent
+            except OSError as e:
+                # Send buffer full (raw sockets report ENOBUFS); let it drain
+                if not isinstance(e, BlockingIOError) and e.errno != errno.ENOBUFS:
+                    raise
+                if time.monotonic() >= give_up:
+                    raise
+                await asyncio.sleep(0.001)
+
+    def _on_readable(self):
+        while True:
+            try:
+                packet, addr = self._sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.debug(f"ICMP receive error: {e}")
+                return
+            received = time.monotonic()
+            reply = parse_echo_reply(packet, self.is_raw)
+            if reply is None:
+                continue
+            ident, seq = reply
+            if self.is_raw and ident != self.ident:
+                continue
+            fut = self._pending.get((addr[0], seq))
+            if fut is not None and not fut.done():
+                fut.set_result(received)
+
+
+_available: Optional[bool] = None
+
+
+def icmp_available() -> bool:
+    """Whether this process may open an ICMP socket (checked once)"""
+    global _available
+    if _available is None:
+        try:
+            sock, is_raw = open_icmp_socket()
+            sock.close()
+            _available = True
+            logger.info(f"In-process ICMP available ({'raw' if is_raw else 'datagram'} socket)")
+        except (OSError, AttributeError) as e:
+            _available = False
+            logger.info(f"In-process ICMP unavailable, using ping subprocesses: {e}")
+    return _available
+
+
+async def ping_hosts_async(ips: Iterable[str], timeout: float = 1.0,
+                           max_in_flight: int = ICMP_MAX_IN_FLIGHT) -> Optional[Dict[str, Optional[float]]]:
+    """Sweep every address with :meth:`IcmpEngine.ping_stream`: ``{ip: rtt_ms or None}``.
+
+    ``timeout`` caps the adaptive per-probe timeout.
+
+    Returns None when no ICMP socket can be opened so the caller can fall
+    back to the ``ping`` subprocess path.
+    """
+    if not icmp_available():
+        return None
+    async with IcmpEngine(max_in_flight) as engine:
+        return await engine.ping_many(ips, timeout)
+
+
+def ping_hosts(ips: Iterable[str], timeout: float = 1.0,
+               max_in_flight: int = ICMP_MAX_IN_FLIGHT) -> Optional[Dict[str, Optional[float]]]:
+    """Blocking form of :func:`ping_hosts_async`.
+
+    Called from a thread that is already running an event loop, the sweep
+    runs on a helper thread with its own loop.
+    """
+    if not icmp_available():
+        return None
+    sweep = ping_hosts_async(ips, timeout, max_in_flight)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(sweep)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, sweep).result()
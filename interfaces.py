@@ -0,0 +1,178 @@
+"""
+Interface Address Enumeration
+Lists IPv4 addresses of up, non-loopback interfaces through netlink or ioctls,
+cached until the kernel reports a link or address change
+"""
+
+import ipaddress
+import logging
+import socket
+import struct
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import netlink
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+IFF_UP = 0x01
+IFF_LOOPBACK = 0x08
+
+IFLA_IFNAME = 3
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+_IFINFOMSG = struct.Struct('=BxHiII')  # family, type, index, flags, change
+_IFADDRMSG = struct.Struct('=BBBBI')  # family, prefixlen, flags, scope, index
+
+# linux/sockios.h
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+
+
+class Address(NamedTuple):
+    interface: str
+    ip_address: str
+    prefixlen: int
+
+
+def _usable(name: Optional[str], flags: int, ip_address: str) -> bool:
+    return (bool(name) and flags & IFF_UP and not flags & IFF_LOOPBACK
+            and not ipaddress.IPv4Address(ip_address).is_loopback)
+
+
+def parse_link_messages(chunks: Iterable[bytes]) -> Dict[int, Tuple[str, int]]:
+    """``{ifindex: (name, flags)}`` from RTM_NEWLINK netlink datagrams"""
+    links = {}
+    for chunk in chunks:
+        for msg_type, _, body in netlink.iter_messages(chunk):
+            if msg_type != netlink.RTM_NEWLINK or len(body) < _IFINFOMSG.size:
+                continue
+            _, _, index, flags, _ = _IFINFOMSG.unpack_from(body)
+            name = netlink.parse_attrs(body[_IFINFOMSG.size:]).get(IFLA_IFNAME)
+            if name:
+                links[index] = (name.rstrip(b'\x00').decode(errors='replace'), flags)
+    return links
+
+
+def parse_addr_messages(chunks: Iterable[bytes], links: Dict[int, Tuple[str, int]]) -> List[Address]:
+    """IPv4 addresses from RTM_NEWADDR datagrams on up, non-loopback links.
+
+    ``links`` is the result of :func:`parse_link_messages`; addresses on
+    links missing from it are skipped.
+    """
+    addresses = []
+    for chunk in chunks:
+        for msg_type, _, body in netlink.iter_messages(chunk):
+            if msg_type != netlink.RTM_NEWADDR or len(body) < _IFADDRMSG.size:
+                continue
+            family, prefixlen, _, _, index = _IFADDRMSG.unpack_from(body)
+            if family != socket.AF_INET:
+                continue
+            attrs = netlink.parse_attrs(body[_IFADDRMSG.size:])
+            # IFA_LOCAL is the interface's own address; IFA_ADDRESS is the
+            # peer on point-to-point links and the same value elsewhere
+            raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+            if not raw or len(raw) != 4:
+                continue
+            name, flags = links.get(index, (None, 0))
+            ip_address = socket.inet_ntoa(raw)
+            if _usable(name, flags, ip_address):
+                addresses.append(Address(name, ip_address, prefixlen))
+    return addresses
+
+
+def read_addresses() -> List[Address]:
+    """Interface addresses from netlink link and address dumps"""
+    links = parse_link_messages(netlink.dump(netlink.RTM_GETLINK, _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)))
+    return parse_addr_messages(netlink.dump(netlink.RTM_GETADDR, _IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0)), links)
+
+
+def read_addresses_ioctl() -> List[Address]:
+    """Interface addresses from SIOCGIF* ioctls.
+
+    Only reports the primary address of each interface; secondary
+    addresses are visible through netlink alone.
+    """
+    if fcntl is None:
+        raise OSError("ioctl interface enumeration needs fcntl")
+    addresses = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            ifreq = struct.pack('256s', name.encode()[:15])
+            try:
+                flags = struct.unpack_from('H', fcntl.ioctl(sock.fileno(), SIOCGIFFLAGS, ifreq), 16)[0]
+                ip_address = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, ifreq)[20:24])
+                netmask = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, ifreq)[20:24])
+            except OSError:
+                # No IPv4 address assigned
+                continue
+            if _usable(name, flags, ip_address):
+                prefixlen = ipaddress.IPv4Network(f"0.0.0.0/{netmask}").prefixlen
+                addresses.append(Address(name, ip_address, prefixlen))
+    finally:
+        sock.close()
+    return addresses
+
+
+class AddressCache:
+    """Interface addresses, re-read only after a netlink change notification.
+
+    A socket subscribed to link and IPv4 address groups is opened before the
+    first read, so a change that lands during the read still invalidates it.
+    :meth:`get` drains that socket without blocking; any message (or a
+    receive buffer overflow) marks the cache stale. Without netlink every
+    call re-reads through the ioctls.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._addresses: Optional[List[Address]] = None
+        self._events: Optional[socket.socket] = None
+        self._subscribed = False
+
+    def get(self) -> List[Address]:
+        with self.lock:
+            if not self._subscribed:
+                self._subscribed = True
+                try:
+                    self._events = netlink.subscribe(netlink.RTMGRP_LINK | netlink.RTMGRP_IPV4_IFADDR)
+                except (OSError, AttributeError) as e:
+                    logger.debug(f"Netlink change notifications unavailable, interface cache disabled: {e}")
+            if self._drain_events() or self._addresses is None:
+                self._addresses = self._read()
+            return list(self._addresses)
+
+    def _drain_events(self) -> bool:
+        """Whether a change notification arrived since the last call"""
+        if self._events is None:
+            return True
+        changed = False
+        while True:
+            try:
+                self._events.recv(65536)
+                changed = True
+            except (BlockingIOError, InterruptedError):
+                return changed
+            except OSError as e:
+                # ENOBUFS: notifications were dropped, so assume a change
+                logger.debug(f"Netlink notification socket error: {e}")
+                return True
+
+    def _read(self) -> List[Address]:
+        if self._events is not None:
+            try:
+                return read_addresses()
+            except OSError as e:
+                logger.debug(f"Netlink address dump failed, using ioctls: {e}")
+        return read_addresses_ioctl()
+
+
+address_cache = AddressCache()
@@ -0,0 +1,174 @@
+"""
+Neighbor Table Discovery
+Reads IPv4 neighbor (ARP) entries from the Linux kernel after priming it,
+without arp-scan or other subprocesses
+"""
+
+import ipaddress
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+import netlink
+
+logger = logging.getLogger(__name__)
+
+PROC_NET_ARP = '/proc/net/arp'
+
+# How long to wait for ARP resolution after priming a range
+ARP_PRIME_WAIT = float(os.environ.get('ARP_PRIME_WAIT', '1.0'))
+
+# Neighbor states (linux/neighbour.h)
+NUD_INCOMPLETE = 0x01
+NUD_REACHABLE = 0x02
+NUD_STALE = 0x04
+NUD_DELAY = 0x08
+NUD_PROBE = 0x10
+NUD_FAILED = 0x20
+NUD_NOARP = 0x40
+NUD_PERMANENT = 0x80
+
+# Entries that carry a usable MAC address
+NUD_VALID = NUD_REACHABLE | NUD_STALE | NUD_DELAY | NUD_PROBE | NUD_PERMANENT
+
+NDA_DST = 1
+NDA_LLADDR = 2
+
+_NDMSG = struct.Struct('=BxxxiHBB')  # family, ifindex, state, flags, type
+
+# /proc/net/arp flags
+ATF_COM = 0x02
+
+
+class Neighbor(NamedTuple):
+    ip_address: str
+    mac_address: Optional[str]
+    interface: Optional[str]
+    state: int
+
+
+def _format_mac(raw: bytes) -> str:
+    return ':'.join(f'{b:02x}' for b in raw)
+
+
+def parse_neigh_messages(chunks: Iterable[bytes], ifnames: Optional[dict] = None) -> List[Neighbor]:
+    """Neighbors from RTM_NEWNEIGH netlink datagrams, IPv4 only.
+
+    ``ifnames`` maps interface index to name; without it indexes are
+    resolved with ``socket.if_indextoname``.
+    """
+    neighbors = []
+    for chunk in chunks:
+        for msg_type, _, body in netlink.iter_messages(chunk):
+            if msg_type != netlink.RTM_NEWNEIGH or len(body) < _NDMSG.size:
+                continue
+            family, ifindex, state, _, _ = _NDMSG.unpack_from(body)
+            if family != socket.AF_INET:
+                continue
+            attrs = netlink.parse_attrs(body[_NDMSG.size:])
+            dst = attrs.get(NDA_DST)
+            if not dst or len(dst) != 4:
+                continue
+            lladdr = attrs.get(NDA_LLADDR)
+            if ifnames is not None:
+                name = ifnames.get(ifindex)
+            else:
+                try:
+                    name = socket.if_indextoname(ifindex)
+                except OSError:
+                    name = None
+            neighbors.append(Neighbor(socket.inet_ntoa(dst), _format_mac(lladdr) if lladdr else None, name, state))
+    return neighbors
+
+
+def parse_proc_net_arp(text: str) -> List[Neighbor]:
+    """Neighbors from the text of /proc/net/arp.
+
+    The file has no NUD state; complete entries are reported as reachable
+    (or permanent) and incomplete ones as incomplete.
+    """
+    neighbors = []
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 6:
+            continue
+        ip_address, _, flags, mac, _, device = fields[:6]
+        try:
+            flags = int(flags, 16)
+        except ValueError:
+            continue
+        if not flags & ATF_COM:
+            state = NUD_INCOMPLETE
+        elif flags & 0x04:
+            state = NUD_PERMANENT
+        else:
+            state = NUD_REACHABLE
+        neighbors.append(Neighbor(ip_address, mac.lower() if flags & ATF_COM else None, device, state))
+    return neighbors
+
+
+def read_neighbors() -> List[Neighbor]:
+    """Current IPv4 neighbor table: netlink first, /proc/net/arp as fallback"""
+    try:
+        payload = _NDMSG.pack(socket.AF_INET, 0, 0, 0, 0)
+        return parse_neigh_messages(netlink.dump(netlink.RTM_GETNEIGH, payload))
+    except (OSError, AttributeError) as e:
+        logger.debug(f"Netlink neighbor dump failed, reading {PROC_NET_ARP}: {e}")
+    with open(PROC_NET_ARP) as f:
+        return parse_proc_net_arp(f.read())
+
+
+def prime(target_ips: Iterable[str], port: int = 9):
+    """Send one UDP datagram to each address so the kernel resolves it.
+
+    Port 9 (discard) is used; the datagram itself does not matter, only the
+    ARP request the kernel has to send before it. Send errors are ignored.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    try:
+        for ip in target_ips:
+            try:
+                sock.sendto(b'', (str(ip), port))
+            except OSError:
+                continue
+    finally:
+        sock.close()
+
+
+def discover(network: ipaddress.IPv4Network, interface: Optional[str] = None,
+             wait: float = ARP_PRIME_WAIT, stop: Optional[threading.Event] = None,
+             targets: Optional[Iterable[str]] = None) -> List[Neighbor]:
+    """Prime ``targets`` (default: every host in ``network``) and return
+    neighbors in ``network`` with a usable MAC.
+
+    Without ``stop`` the table is polled until no entry in the range is
+    still resolving or ``wait`` seconds pass. With ``stop``, some other
+    traffic (such as a ping sweep) is filling the table: the call blocks
+    until ``stop`` is set and then reads the table once. Hosts that never
+    answered are left out.
+    """
+    if targets is None:
+        targets = (str(ip) for ip in network.hosts())
+    prime(targets)
+
+    def read() -> List[Neighbor]:
+        return [n for n in read_neighbors()
+                if (interface is None or n.interface in (None, interface))
+                and ipaddress.IPv4Address(n.ip_address) in network]
+
+    if stop is not None:
+        stop.wait()
+        entries = read()
+    else:
+        deadline = time.monotonic() + wait
+        while True:
+            entries = read()
+            if not any(n.state & NUD_INCOMPLETE for n in entries) or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+    return [n for n in entries if n.state & NUD_VALID and n.mac_address and n.mac_address != '00:00:00:00:00:00']
@@ -0,0 +1,103 @@
+"""
+Netlink Helpers
+Minimal rtnetlink (NETLINK_ROUTE) dump requests and message parsing for Linux
+"""
+
+import socket
+import struct
+from typing import Dict, Iterator, List, Tuple
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_DUMP = 0x300
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+
+# Multicast groups (bitmask form accepted by bind)
+RTMGRP_LINK = 0x01
+RTMGRP_IPV4_IFADDR = 0x10
+
+_NLMSGHDR = struct.Struct('=IHHII')  # len, type, flags, seq, pid
+_RTATTR = struct.Struct('=HH')  # len, type
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def iter_messages(data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    """``(type, flags, payload)`` for every netlink message in ``data``"""
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, flags, _, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size or offset + length > len(data):
+            break
+        yield msg_type, flags, data[offset + _NLMSGHDR.size:offset + length]
+        offset += _align(length)
+
+
+def parse_attrs(data: bytes) -> Dict[int, bytes]:
+    """rtattr TLVs as ``{type: value}``; nested attributes are left packed"""
+    attrs = {}
+    offset = 0
+    while offset + _RTATTR.size <= len(data):
+        length, attr_type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size or offset + length > len(data):
+            break
+        attrs[attr_type] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def dump(msg_type: int, payload: bytes, timeout: float = 2.0) -> List[bytes]:
+    """Send one NLM_F_DUMP request and return the raw reply datagrams.
+
+    Raises OSError when netlink is unavailable or the kernel returns an error.
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.settimeout(timeout)
+        sock.bind((0, 0))
+        seq = 1
+        header = _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type, NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+        sock.send(header + payload)
+        chunks = []
+        while True:
+            data = sock.recv(65536)
+            chunks.append(data)
+            for reply_type, _, body in iter_messages(data):
+                if reply_type == NLMSG_DONE:
+                    return chunks
+                if reply_type == NLMSG_ERROR:
+                    errno = struct.unpack_from('=i', body)[0]
+                    if errno:
+                        raise OSError(-errno, f"netlink request {msg_type} failed")
+    finally:
+        sock.close()
+
+
+def subscribe(groups: int) -> socket.socket:
+    """Non-blocking socket that receives rtnetlink notifications for ``groups``.
+
+    Raises OSError when netlink is unavailable.
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.bind((0, groups))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
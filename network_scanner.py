@@ -3,33 +3,162 @@ Network Scanner Module - Subnet-level network discovery
 Provides interface detection, ARP scanning, and ping sweep capabilities
 """
 
+import asyncio
 import ipaddress
+import itertools
 import logging
+import math
+import multiprocessing
+import os
 import platform
 import re
 import socket
+import struct
 import subprocess
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import icmp
+import interfaces
+import neighbors
+import tcp_probe
+from rate_limit import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# Upper bound in seconds on a subnet's ping sweep, retransmissions included
+SCAN_MAX_TIME = float(os.environ.get('SCAN_MAX_TIME', '60'))
+
+# Incremental scans: known hosts seen within this many seconds are probed
+# first, and the rest of the subnet is swept at most once per interval
+SCAN_WARM_WINDOW = float(os.environ.get('SCAN_WARM_WINDOW', '86400'))
+SCAN_FULL_SWEEP_INTERVAL = float(os.environ.get('SCAN_FULL_SWEEP_INTERVAL', '3600'))
+
+# Packets per second across all concurrent scans (ICMP and TCP); 0 disables
+SCAN_MAX_PPS = float(os.environ.get('SCAN_MAX_PPS', '20000'))
+
+# Addresses per sweep shard; bounds per-scan memory on large ranges
+SCAN_SHARD_SIZE = int(os.environ.get('SCAN_SHARD_SIZE', '4096'))
+
+# Shards swept at once, so one shard's timeouts overlap the next one's sends
+_SHARDS_IN_FLIGHT = 2
+
+# `ping` subprocesses run at once when no ICMP socket is available
+_PING_WORKERS = 20
+
+# Worker processes for ping sweeps; 0 or 1 sweeps in this process
+SCAN_PROCESSES = int(os.environ.get('SCAN_PROCESSES', '0'))
+
+# Answers sent back by sweep workers: packed IPv4 address, RTT in ms
+_REPLY = struct.Struct('=4sf')
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_size = 0
+_process_pool_lock = threading.Lock()
+
+
+def _run_sync(coro):
+    """Run ``coro`` to completion from synchronous code.
+
+    Called from a thread that is already running an event loop, it runs on a
+    helper thread with its own loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def host_range(network: ipaddress.IPv4Network) -> range:
+    """Integer addresses of the hosts ``network.hosts()`` would list"""
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.prefixlen >= 31:
+        return range(first, last + 1)
+    return range(first + 1, last)
+
+
+def iter_hosts(network: ipaddress.IPv4Network) -> Iterator[str]:
+    """Host addresses of ``network`` as strings, generated lazily"""
+    return (socket.inet_ntoa(n.to_bytes(4, 'big')) for n in host_range(network))
+
+
+def _shards(ips: Iterable[str], size: int, deadline: Optional[float] = None) -> Iterator[List[str]]:
+    """``ips`` in lists of ``size``; no more are taken once ``deadline`` (monotonic) passes"""
+    it = iter(ips)
+    while deadline is None or time.monotonic() < deadline:
+        shard = list(itertools.islice(it, size))
+        if not shard:
+            return
+        yield shard
+
+
+def _get_process_pool(processes: int) -> ProcessPoolExecutor:
+    """The shared sweep worker pool, (re)created with ``processes`` workers.
+
+    Workers are spawned rather than forked so they do not inherit the
+    database connection or the parent's threads.
+    """
+    global _process_pool, _process_pool_size
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_size != processes:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+            _process_pool_size = processes
+        return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def _sweep_shard(packed: bytes, timeout: float, deadline: float, in_flight: int, pps: float,
+                 srtt: Optional[float], rttvar: Optional[float]) -> bytes:
+    """Worker process entry: sweep one packed shard in a fresh event loop.
+
+    ``deadline`` is a ``time.monotonic()`` value from the parent (the clock
+    is system-wide), so a shard that waited in the pool's queue gets only
+    the time left. The worker's RTT estimate starts from the parent's
+    ``srtt`` and ``rttvar``. Returns the answers packed with ``_REPLY``;
+    their RTTs are the raw samples the parent feeds its own estimate with.
+    """
+    max_time = deadline - time.monotonic()
+    if max_time <= 0:
+        return b''
+    ips = [socket.inet_ntoa(packed[i:i + 4]) for i in range(0, len(packed), 4)]
+    timing = icmp.RttEstimator(maximum=timeout)
+    timing.srtt, timing.rttvar = srtt, rttvar
+
+    async def sweep() -> List[bytes]:
+        async with icmp.IcmpEngine(in_flight, TokenBucket(pps) if pps > 0 else None) as engine:
+            return [_REPLY.pack(socket.inet_aton(ip), rtt)
+                    async for ip, rtt in engine.ping_stream(ips, timeout, timing=timing, max_time=max_time)
+                    if rtt is not None]
+
+    return b''.join(asyncio.run(sweep()))
+
 
 def _get_db():
     try:
-        import importlib.util
+        import importlib
         import sys
         BACKEND = Path(__file__).parent
         if str(BACKEND) not in sys.path:
             sys.path.insert(0, str(BACKEND))
-        spec = importlib.util.spec_from_file_location('backend_db', str(BACKEND / 'db.py'))
-        mod = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(mod)
-        return mod.Database
+        # Import (rather than re-execute) db.py so the scanner shares the
+        # process-wide connection pool with the API.
+        return importlib.import_module('db').Database
     except Exception as e:
         logger.debug(f"Could not load Database module: {e}")
         return None
@@ -74,6 +203,7 @@ class DiscoveredDevice:
         self.device_type = device_type
         self.status = "up"
         self.latency_ms = None
+        self.open_ports: List[int] = []
         self.discovered_at = datetime.now().isoformat()
 
     def to_dict(self) -> Dict:
@@ -83,17 +213,49 @@ class DiscoveredDevice:
             "device_type": self.device_type,
             "status": self.status,
             "latency_ms": self.latency_ms,
+            "open_ports": self.open_ports,
             "discovered_at": self.discovered_at
         }
 
 
+class ScanBudget:
+    """Limits shared by every scan that uses it.
+
+    Covers ICMP probes in flight, TCP connects in flight, and packets per
+    second across both. Enter it with ``async with`` in the event loop that
+    runs the scans. Nested entries share one ICMP engine, which is None
+    when no ICMP socket is available.
+    """
+
+    def __init__(self, icmp_in_flight: int = icmp.ICMP_MAX_IN_FLIGHT,
+                 connects: int = tcp_probe.TCP_PROBE_CONCURRENCY, pps: float = SCAN_MAX_PPS):
+        self.rate = TokenBucket(pps) if pps > 0 else None
+        self.connects = tcp_probe.connect_slots(connects)
+        self.icmp_in_flight = icmp_in_flight
+        self.engine: Optional[icmp.IcmpEngine] = None
+        self._users = 0
+
+    async def __aenter__(self) -> 'ScanBudget':
+        if self._users == 0 and icmp.icmp_available():
+            self.engine = icmp.IcmpEngine(self.icmp_in_flight, self.rate)
+            self.engine.open()
+        self._users += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self._users -= 1
+        if self._users == 0 and self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+
 class SubnetScanner:
     """Performs unified subnet-level scanning"""
 
     def __init__(self):
         self.os_type = platform.system().lower()
-        self.discovered_devices: Dict[str, DiscoveredDevice] = {}
-        self._lock = threading.Lock()
+        # RTT model per subnet, kept so later scans start with tuned timeouts
+        self._timing: Dict[str, icmp.RttEstimator] = {}
 
     def get_active_interfaces(self) -> List[NetworkInterface]:
         """Detect and return all active network interfaces"""
@@ -167,7 +329,16 @@ class SubnetScanner:
 
     def _get_interfaces_unix(self) -> List[NetworkInterface]:
         """Get network interfaces on Linux/macOS"""
-        interfaces = []
+        if self.os_type == "linux":
+            try:
+                return [
+                    NetworkInterface(addr.interface, addr.ip_address, self._cidr_to_netmask(addr.prefixlen))
+                    for addr in interfaces.address_cache.get()
+                ]
+            except Exception as e:
+                logger.debug(f"Kernel interface enumeration failed, falling back to ip addr: {e}")
+
+        found = []
         try:
             result = subprocess.run(
                 ["ip", "addr"],
@@ -193,7 +364,7 @@ class SubnetScanner:
                         try:
                             interface = NetworkInterface(
                                 interface_name, ip_address, netmask)
-                            interfaces.append(interface)
+                            found.append(interface)
                         except Exception as e:
                             logger.debug(f"Error creating interface: {e}")
 
@@ -202,7 +373,7 @@ class SubnetScanner:
         except Exception as e:
             logger.error(f"Error getting Unix interfaces: {e}")
 
-        return interfaces
+        return found
 
     def _get_interfaces_generic(self) -> List[NetworkInterface]:
         """Fallback method using Python socket"""
@@ -227,92 +398,229 @@ class SubnetScanner:
         return ".".join([str((mask >> (i << 3)) & 0xff) for i in (3, 2, 1, 0)])
 
     def scan_subnet(self, interface: NetworkInterface,
-                    timeout: int = 2) -> List[DiscoveredDevice]:
+                    timeout: int = 2, incremental: bool = False) -> List[DiscoveredDevice]:
         """Scan a subnet for active devices using ARP, Ping, and TCP probes.
 
-        Returns consolidated list of discovered devices and persists them into DB.
+        Returns the devices yielded by :meth:`scan_subnet_stream`, which
+        persists them into DB before it finishes.
         """
-        devices: List[DiscoveredDevice] = []
-        self.discovered_devices.clear()
+        async def collect():
+            return [device async for device in self.scan_subnet_stream(interface, timeout, incremental=incremental)]
 
-        # FIXED: Combined multiline string to single line
+        return _run_sync(collect())
+
+    async def scan_subnet_stream(self, interface: NetworkInterface, timeout: int = 2,
+                                 max_time: float = SCAN_MAX_TIME, incremental: bool = False,
+                                 budget: Optional[ScanBudget] = None) -> AsyncIterator[DiscoveredDevice]:
+        """Scan a subnet, yielding each device as soon as a probe confirms it.
+
+        ARP and the ping sweep run concurrently. A newly confirmed device is
+        yielded at once and handed to the TCP stage. When its ports are known,
+        it moves on to the persistence stage, which stores them on the device
+        row and batches whatever has queued up while the previous write ran. All three stages overlap.
+
+        Yielded objects are live: ``open_ports``, and a MAC or latency reported
+        by the other discovery method, are filled in after the yield.
+        Iteration ends only when every stage is done, so every device is
+        persisted by then. Devices are keyed by IP address.
+
+        The ping sweep adapts its probe timeout to the subnet's measured RTT,
+        capped at ``timeout`` seconds, and gives up after ``max_time``.
+
+        With ``incremental`` only part of the subnet is probed; see
+        :meth:`_incremental_targets`. Scans given the same ``budget`` share
+        its in-flight and packet-rate limits; without one the scan gets its
+        own. All other state is local to the call.
+        """
         logger.info(f"Starting subnet scan on {interface.subnet} ({interface.name})")
 
         network = ipaddress.IPv4Network(interface.subnet, strict=False)
-        host_addresses = list(network.hosts())
+        host_count = len(host_range(network))
 
-        if not host_addresses:
+        if not host_count:
             logger.warning(f"No host addresses in subnet {interface.subnet}")
-            return []
-
-        # ARP (fast if available)
-        arp_devices = self._arp_scan(interface, host_addresses)
-        devices.extend(arp_devices)
-
-        # Ping sweep to find nodes that respond to ICMP
-        ping_devices = self._ping_sweep(host_addresses, timeout)
-        for device in ping_devices:
-            if device.ip_address not in [d.ip_address for d in devices]:
-                devices.append(device)
-
-        # Lightweight TCP probe on common ports to confirm hosts
-        ports = [80, 443, 445, 3389]
-        ips_to_probe = [d.ip_address for d in devices]
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = {
-                executor.submit(self._tcp_probe, ip, ports, 0.4): ip for ip in ips_to_probe}
-            for fut in as_completed(futures):
-                ip = futures[fut]
-                try:
-                    open_port = fut.result()
-                    if open_port:
-                        for d in devices:
-                            if d.ip_address == ip:
-                                d.device_type = d.device_type or 'tcp_host'
-                except Exception:
-                    continue
-
-        # Consolidate results: prefer MAC as primary key, fallback to IP
-        consolidated: Dict[str, DiscoveredDevice] = {}
-        for d in devices:
-            key = d.mac_address if d.mac_address else d.ip_address
-            if key in consolidated:
-                existing = consolidated[key]
-                if not existing.mac_address and d.mac_address:
-                    existing.mac_address = d.mac_address
-                if not existing.latency_ms and d.latency_ms:
-                    existing.latency_ms = d.latency_ms
-            else:
-                consolidated[key] = d
-
-        results = list(consolidated.values())
+            return
+
+        warm: List[str] = []
+        fresh: List[neighbors.Neighbor] = []
+        full_sweep = True
+        if incremental:
+            # Database queries and a netlink dump; keep them off the event loop
+            warm, fresh, full_sweep = await asyncio.to_thread(self._incremental_targets, interface, network)
+        skip = set(warm) | {n.ip_address for n in fresh}
+        # Addresses are generated as the sweep consumes them
+        targets = itertools.chain(warm, (ip for ip in iter_hosts(network) if ip not in skip) if full_sweep else ())
+        if incremental:
+            probing = host_count - len(fresh) if full_sweep else len(warm)
+            logger.info(f"Incremental scan of {interface.subnet}: probing {probing} of "
+                        f"{host_count} addresses, {len(fresh)} taken from the neighbor table")
+        # The sweep's own probes make the kernel resolve on-link addresses,
+        # so only the Windows `arp -a` lookups need a target list
+        arp_targets = [] if self.os_type != "windows" else list(itertools.islice(
+            itertools.chain(warm, iter_hosts(network)), 50))
+        started = time.monotonic()
+
+        loop = asyncio.get_running_loop()
+        budget = budget or ScanBudget()
+        found: Dict[str, DiscoveredDevice] = {}
+        confirmed: asyncio.Queue = asyncio.Queue()
+        to_persist: asyncio.Queue = asyncio.Queue()
+        probes: Set[asyncio.Task] = set()
+        # Hosts whose open_ports are a probe result rather than the default
+        probed: Set[str] = set()
+
+        async def probe(device: DiscoveredDevice):
+            device.open_ports = await tcp_probe.probe_host(device.ip_address, tcp_probe.DEFAULT_PORTS, 0.4,
+                                                           budget.connects, budget.rate)
+            probed.add(device.ip_address)
+            to_persist.put_nowait(device)
+
+        def confirm(device: DiscoveredDevice):
+            existing = found.get(device.ip_address)
+            if existing is None:
+                found[device.ip_address] = device
+                confirmed.put_nowait(device)
+                task = asyncio.create_task(probe(device))
+                probes.add(task)
+                task.add_done_callback(probes.discard)
+                return
+            changed = False
+            if not existing.mac_address and device.mac_address:
+                existing.mac_address = device.mac_address
+                existing.device_type = device.device_type
+                changed = True
+            if existing.latency_ms is None and device.latency_ms is not None:
+                existing.latency_ms = device.latency_ms
+                changed = True
+            if changed:
+                to_persist.put_nowait(existing)
+
+        # Live hosts have resolved by the time the sweep has had its replies
+        sweep_done = threading.Event()
+
+        async def arp():
+            for device in await loop.run_in_executor(None, self._arp_scan, interface, arp_targets, sweep_done):
+                confirm(device)
+
+        async def sweep():
+            try:
+                await ping_all()
+            finally:
+                sweep_done.set()
+
+        async def ping_all():
+            timing = self._timing_for(interface.subnet, timeout)
+            async for device in self._ping_stream(targets, timing, max_time, budget):
+                confirm(device)
+
+        async def persist():
+            Database = _get_db()
+            while True:
+                # Everything queued during the previous write goes in one batch
+                batch: Dict[str, DiscoveredDevice] = {}
+                device = await to_persist.get()
+                while device is not None:
+                    batch[device.ip_address] = device
+                    if to_persist.empty():
+                        break
+                    device = to_persist.get_nowait()
+                if Database and batch:
+                    await loop.run_in_executor(None, Database.upsert_devices_from_scan, [
+                        {
+                            'ip_address': dev.ip_address,
+                            'mac_address': dev.mac_address,
+                            'device_type': dev.device_type,
+                            'subnet': interface.subnet,
+                            'latency_ms': dev.latency_ms,
+                            'interface_name': interface.name,
+                            'open_ports': dev.open_ports if dev.ip_address in probed else None,
+                        }
+                        for dev in batch.values()
+                    ])
+                if device is None:
+                    return
+
+        async with budget:
+            writer = asyncio.create_task(persist())
+            for n in fresh:
+                confirm(DiscoveredDevice(n.ip_address, n.mac_address, "discovered"))
+            discovery = asyncio.gather(arp(), sweep())
+            discovery.add_done_callback(lambda _: confirmed.put_nowait(None))
+            try:
+                while True:
+                    device = await confirmed.get()
+                    if device is None:
+                        break
+                    yield device
+                await discovery
+                while probes:
+                    await asyncio.gather(*probes)
+                to_persist.put_nowait(None)
+                await writer
+                Database = _get_db()
+                if Database:
+                    # Also what the next incremental scan times its full sweep from
+                    duration_ms = int((time.monotonic() - started) * 1000)
+                    await loop.run_in_executor(None, lambda: Database.create_subnet_scan(
+                        interface.subnet, interface.name, host_count, len(found), duration_ms,
+                        full_sweep=full_sweep))
+            finally:
+                stages = (discovery, writer, *probes)
+                for task in stages:
+                    task.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+
+        logger.info(f"Subnet scan completed: found {len(found)} devices")
+
+    def _incremental_targets(self, interface: NetworkInterface, network: ipaddress.IPv4Network
+                             ) -> Tuple[List[str], List[neighbors.Neighbor], bool]:
+        """Plan an incremental scan: ``(warm addresses, neighbors to report as is, full sweep)``.
+
+        REACHABLE entries in the kernel neighbor table were confirmed within
+        the last few seconds and are reported without probing. Known devices
+        that are up or were seen within ``SCAN_WARM_WINDOW`` are probed
+        first, most recently seen first. The rest of the subnet follows them
+        only when its last full sweep, as recorded in ``subnet_scans``, is
+        older than ``SCAN_FULL_SWEEP_INTERVAL``.
+        """
+        fresh: List[neighbors.Neighbor] = []
+        if self.os_type == "linux":
+            try:
+                fresh = [n for n in neighbors.read_neighbors()
+                         if n.state & neighbors.NUD_REACHABLE and n.mac_address
+                         and n.interface in (None, interface.name)
+                         and ipaddress.IPv4Address(n.ip_address) in network]
+            except Exception as e:
+                logger.debug(f"Could not read neighbor table: {e}")
+        skip = {n.ip_address for n in fresh}
 
-        # Persist to DB (update by MAC then IP)
         Database = _get_db()
-        if Database:
-            for dev in results:
-                try:
-                    rec = Database.upsert_device_from_scan(
-                        dev.ip_address,
-                        dev.mac_address,
-                        dev.device_type,
-                        interface.subnet,
-                        dev.latency_ms)
-                    if rec and 'id' in rec:
-                        try:
-                            Database.update_device(
-                                rec['id'], {'interface_name': interface.name})
-                        except Exception:
-                            pass
-                except Exception as e:
-                    logger.debug(f"DB upsert failed for {dev.ip_address}: {e}")
+        known = Database.get_devices_by_subnet(interface.subnet) if Database else []
+        cutoff = datetime.utcnow() - timedelta(seconds=SCAN_WARM_WINDOW)
 
-        # FIXED: Combined multiline string to single line
-        logger.info(f"Subnet scan completed: found {len(results)} devices")
-        return results
+        def recent(device: Dict) -> bool:
+            last_seen = device.get('last_seen')
+            return device.get('status') == 'up' or (isinstance(last_seen, datetime) and last_seen >= cutoff)
+
+        warm = sorted((d for d in known if recent(d)),
+                      key=lambda d: d.get('last_seen') or datetime.min, reverse=True)
+        targets = []
+        for device in warm:
+            try:
+                ip = ipaddress.IPv4Address(device['ip_address'])
+            except ValueError:
+                continue
+            if ip in network and str(ip) not in skip:
+                targets.append(str(ip))
+                skip.add(str(ip))
+
+        last = Database.get_last_full_sweep(interface.subnet) if Database else None
+        full_sweep = last is None or datetime.utcnow() - last >= timedelta(seconds=SCAN_FULL_SWEEP_INTERVAL)
+        return targets, fresh, full_sweep
 
     def _arp_scan(self, interface: NetworkInterface,
-                  target_ips: List[ipaddress.IPv4Address]) -> List[DiscoveredDevice]:
+                  target_ips: List[str],
+                  stop: Optional[threading.Event] = None) -> List[DiscoveredDevice]:
         """Perform ARP scan to discover devices"""
         devices = []
 
@@ -320,14 +628,14 @@ class SubnetScanner:
             if self.os_type == "windows":
                 devices = self._arp_scan_windows(target_ips)
             elif self.os_type in ["linux", "darwin"]:
-                devices = self._arp_scan_unix(interface, target_ips)
+                devices = self._arp_scan_unix(interface, target_ips, stop)
         except Exception as e:
             logger.warning(f"ARP scan failed: {e}")
 
         return devices
 
     def _arp_scan_windows(
-            self, target_ips: List[ipaddress.IPv4Address]) -> List[DiscoveredDevice]:
+            self, target_ips: List[str]) -> List[DiscoveredDevice]:
         """Perform ARP scan on Windows"""
         devices = []
 
@@ -354,10 +662,21 @@ class SubnetScanner:
         return devices
 
     def _arp_scan_unix(self, interface: NetworkInterface,
-                       target_ips: List[ipaddress.IPv4Address]) -> List[DiscoveredDevice]:
+                       target_ips: List[str],
+                       stop: Optional[threading.Event] = None) -> List[DiscoveredDevice]:
         """Perform ARP scan on Unix-like systems"""
         devices = []
 
+        # Linux: prime and read the kernel neighbor table, no subprocess
+        if self.os_type == "linux":
+            try:
+                network = ipaddress.IPv4Network(interface.subnet, strict=False)
+                for n in neighbors.discover(network, interface.name, stop=stop, targets=target_ips):
+                    devices.append(DiscoveredDevice(n.ip_address, n.mac_address, "discovered"))
+                return devices
+            except Exception as e:
+                logger.warning(f"Neighbor table discovery failed, trying arp-scan: {e}")
+
         try:
             result = subprocess.run(
                 ["arp-scan", "-l", "--localnet", f"--interface={interface.name}"],
@@ -381,37 +700,183 @@ class SubnetScanner:
 
         return devices
 
-    def _ping_sweep(self,
-                    target_ips: List[ipaddress.IPv4Address],
-                    timeout: int = 2) -> List[DiscoveredDevice]:
-        """Perform ping sweep to discover active hosts"""
-        devices = []
+    def _timing_for(self, subnet: str, timeout: float) -> icmp.RttEstimator:
+        timing = self._timing.setdefault(subnet, icmp.RttEstimator(maximum=timeout))
+        timing.maximum = timeout
+        return timing
 
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = {
-                executor.submit(self._ping_host, str(ip), timeout): str(ip)
-                for ip in target_ips
-            }
+    async def ping_sweep(self, network: ipaddress.IPv4Network, timeout: float = 2,
+                         max_time: float = SCAN_MAX_TIME, budget: Optional[ScanBudget] = None,
+                         processes: int = SCAN_PROCESSES) -> AsyncIterator[DiscoveredDevice]:
+        """Ping every host of ``network``, whatever its size, yielding those that answer.
 
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    devices.append(result)
+        No ARP, TCP or persistence: the sweep stage of
+        :meth:`scan_subnet_stream` on its own.
+        """
+        budget = budget or ScanBudget()
+        async with budget:
+            async for device in self._ping_stream(iter_hosts(network), self._timing_for(str(network), timeout),
+                                                  max_time, budget, processes=processes):
+                yield device
+
+    async def _ping_stream(self, target_ips: Iterable[str], timing: icmp.RttEstimator,
+                           max_time: float = SCAN_MAX_TIME,
+                           budget: Optional[ScanBudget] = None,
+                           shard_size: int = SCAN_SHARD_SIZE,
+                           processes: int = SCAN_PROCESSES) -> AsyncIterator[DiscoveredDevice]:
+        """Ping every address, yielding hosts in the order they answer.
+
+        ``target_ips`` is consumed lazily, ``shard_size`` addresses at a time,
+        so memory stays flat however large the range. Probe timeouts follow
+        ``timing``, which is updated with every RTT, and only unanswered
+        addresses are retried (``icmp.ICMP_RETRIES``). No new shard is
+        started after ``max_time``. With ``processes`` above one the shards
+        are swept by worker processes. Without an ICMP engine in ``budget``
+        the sweep runs ``ping`` subprocesses, paced by the budget's packet
+        rate.
+        """
+        deadline = time.monotonic() + max_time
+        shards = _shards(target_ips, shard_size, deadline)
+        engine = budget.engine if budget is not None else None
+
+        if engine is not None and processes > 1:
+            async for device in self._ping_stream_processes(shards, timing, deadline, budget, processes):
+                yield device
+            return
+
+        if engine is not None:
+            # In-process ICMP; the engine's in-flight cap and packet rate
+            # hold across the shards being swept
+            answered: asyncio.Queue = asyncio.Queue()
+
+            async def sweep(shard: List[str]):
+                async for ip_address, rtt in engine.ping_stream(shard, timing.maximum, timing=timing,
+                                                                max_time=max(deadline - time.monotonic(), 0)):
+                    if rtt is not None:
+                        answered.put_nowait((ip_address, rtt))
+
+            async def feed():
+                running: Set[asyncio.Task] = set()
+                try:
+                    for shard in shards:
+                        while len(running) >= _SHARDS_IN_FLIGHT:
+                            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                            for task in done:
+                                task.result()
+                        running.add(asyncio.create_task(sweep(shard)))
+                    if running:
+                        await asyncio.gather(*running)
+                finally:
+                    for task in running:
+                        task.cancel()
+                    answered.put_nowait(None)
+
+            feeder = asyncio.create_task(feed())
+            try:
+                while True:
+                    reply = await answered.get()
+                    if reply is None:
+                        break
+                    device = DiscoveredDevice(reply[0], None, "ping_discovered")
+                    device.latency_ms = round(reply[1], 3)
+                    yield device
+                await feeder
+            finally:
+                feeder.cancel()
+            return
+
+        loop = asyncio.get_running_loop()
+        rate = budget.rate if budget is not None else None
+        executor = ThreadPoolExecutor(max_workers=_PING_WORKERS)
+        try:
+            for shard in shards:
+                pending = shard
+                for _ in range(icmp.ICMP_RETRIES + 1):
+                    if not pending or time.monotonic() >= deadline:
+                        break
+                    probe_timeout = timing.timeout
+                    queued = iter(pending)
+                    running: Set[asyncio.Future] = set()
+                    replied = set()
+                    while True:
+                        # One ping per free worker, each paced by the rate
+                        # limit, and none started after the deadline
+                        while len(running) < _PING_WORKERS and time.monotonic() < deadline:
+                            ip = next(queued, None)
+                            if ip is None:
+                                break
+                            if rate is not None:
+                                await rate.take()
+                            running.add(loop.run_in_executor(executor, self._ping_host, ip, probe_timeout))
+                        if not running:
+                            break
+                        done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                        for fut in done:
+                            device = fut.result()
+                            if device:
+                                replied.add(device.ip_address)
+                                if device.latency_ms is not None:
+                                    timing.observe(device.latency_ms / 1000)
+                                yield device
+                    pending = [ip for ip in pending if ip not in replied]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _ping_stream_processes(self, shards: Iterator[List[str]], timing: icmp.RttEstimator,
+                                     deadline: float, budget: ScanBudget,
+                                     processes: int) -> AsyncIterator[DiscoveredDevice]:
+        """Sweep shards in worker processes, each with its own event loop and ICMP socket.
+
+        Packet parsing and probe bookkeeping then spread across cores. Shards
+        go out as packed 4-byte addresses and answers come back packed, so
+        little is pickled. The budget's in-flight cap and packet rate are
+        split evenly between the workers.
+        """
+        loop = asyncio.get_running_loop()
+        pool = _get_process_pool(processes)
+        in_flight = max(1, budget.icmp_in_flight // processes)
+        pps = budget.rate.rate / processes if budget.rate is not None else 0
+        running: Set[asyncio.Future] = set()
+
+        def submit() -> bool:
+            shard = next(shards, None)
+            if shard is None:
+                return False
+            packed = b''.join(socket.inet_aton(ip) for ip in shard)
+            running.add(loop.run_in_executor(pool, _sweep_shard, packed, timing.maximum, deadline,
+                                             in_flight, pps, timing.srtt, timing.rttvar))
+            return True
 
-        return devices
+        try:
+            # Two shards per worker, so none idles while results come back
+            while len(running) < processes * 2 and submit():
+                pass
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    for packed_ip, rtt in _REPLY.iter_unpack(fut.result()):
+                        timing.observe(rtt / 1000)
+                        device = DiscoveredDevice(socket.inet_ntoa(packed_ip), None, "ping_discovered")
+                        device.latency_ms = round(rtt, 3)
+                        yield device
+                    submit()
+        finally:
+            for fut in running:
+                fut.cancel()
 
     def _ping_host(
             self,
             ip_address: str,
-            timeout: int = 2) -> Optional[DiscoveredDevice]:
+            timeout: float = 2) -> Optional[DiscoveredDevice]:
         """Ping a single host"""
         try:
+            # -w takes milliseconds on Windows; -W takes whole seconds elsewhere
             if self.os_type == "windows":
                 cmd = ["ping", "-n", "1", "-w",
-                       str(timeout * 1000), ip_address]
+                       str(int(timeout * 1000)), ip_address]
             else:
                 cmd = ["ping", "-c", "1", "-W",
-                       str(timeout * 1000), ip_address]
+                       str(max(1, math.ceil(timeout))), ip_address]
 
             result = subprocess.run(
                 cmd,
@@ -430,9 +895,6 @@ class SubnetScanner:
                 if latency_match:
                     device.latency_ms = float(latency_match.group(1))
 
-                with self._lock:
-                    self.discovered_devices[ip_address] = device
-
                 return device
         except (subprocess.TimeoutExpired, Exception) as e:
             logger.debug(f"Ping failed for {ip_address}: {e}")
@@ -440,20 +902,35 @@ class SubnetScanner:
         return None
 
     def scan_all_interfaces(self,
-                            timeout: int = 2) -> Dict[str,
-                                                      List[DiscoveredDevice]]:
-        """Scan all active network interfaces"""
-        results = {}
+                            timeout: int = 2,
+                            incremental: bool = False) -> Dict[str,
+                                                               List[DiscoveredDevice]]:
+        """Scan all active network interfaces concurrently.
+
+        The scans share one :class:`ScanBudget`, so adding interfaces does
+        not raise the packet rate or the number of probes in flight.
+        Interfaces on the same subnet have their results merged.
+        """
         interfaces = self.get_active_interfaces()
 
         logger.info(f"Found {len(interfaces)} active network interfaces")
 
-        for interface in interfaces:
+        async def scan_one(interface: NetworkInterface, budget: ScanBudget) -> List[DiscoveredDevice]:
             try:
-                devices = self.scan_subnet(interface, timeout)
-                results[interface.subnet] = devices
+                return [device async for device in self.scan_subnet_stream(
+                    interface, timeout, incremental=incremental, budget=budget)]
             except Exception as e:
                 logger.error(f"Error scanning subnet {interface.subnet}: {e}")
-                results[interface.subnet] = []
+                return []
+
+        async def scan_all() -> List[List[DiscoveredDevice]]:
+            async with ScanBudget() as budget:
+                return await asyncio.gather(*(scan_one(interface, budget) for interface in interfaces))
 
-        return results
\ No newline at end of file
+        results: Dict[str, List[DiscoveredDevice]] = {}
+        for interface, devices in zip(interfaces, _run_sync(scan_all())):
+            merged = results.setdefault(interface.subnet, [])
+            seen = {d.ip_address for d in merged}
+            merged.extend(d for d in devices if d.ip_address not in seen)
+
+        return results
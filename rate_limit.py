@@ -0,0 +1,37 @@
+"""
+Rate Limiting
+Token bucket shared by asyncio probe senders to cap packets per second
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """``rate`` tokens per second with at most ``burst`` banked.
+
+    Callers await :meth:`take` before each packet. Meant for one event
+    loop; it is not thread-safe.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        # Default: 50 ms worth of packets, so a sweep starts without a stall
+        self.burst = burst if burst is not None else max(1.0, rate / 20)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    async def take(self, tokens: float = 1.0):
+        while True:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            # Sleeping less than a millisecond only spins the event loop
+            await asyncio.sleep(max((tokens - self._tokens) / self.rate, 0.001))
@@ -0,0 +1,45 @@
+"""
+Background Jobs
+Periodic maintenance tasks that run in daemon threads next to the API
+"""
+
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """Runs ``func`` every ``interval`` seconds until stopped"""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], object]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"Started background job {self.name} (every {self.interval}s)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        try:
+            self.func()
+        except Exception as e:
+            logger.error(f"Background job {self.name} failed: {e}", exc_info=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
@@ -0,0 +1,75 @@
+"""
+TCP Connect Prober
+Asyncio connect scan of (host, port) pairs with bounded concurrency
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import struct
+from typing import Iterable, List, Optional
+
+from rate_limit import TokenBucket
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = (80, 443, 445, 3389)
+
+# Connects allowed in flight; each one holds a file descriptor
+TCP_PROBE_CONCURRENCY = int(os.environ.get('TCP_PROBE_CONCURRENCY', '2000'))
+
+# Descriptors kept free for the database, log files and the API's sockets
+_FD_HEADROOM = 128
+
+
+def _fd_budget(concurrency: int) -> int:
+    """Clamp ``concurrency`` to what RLIMIT_NOFILE leaves room for"""
+    if resource is None:
+        return concurrency
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (OSError, ValueError):
+        return concurrency
+    if soft == resource.RLIM_INFINITY:
+        return concurrency
+    return max(1, min(concurrency, soft - _FD_HEADROOM))
+
+
+async def probe_port(host: str, port: int, timeout: float, slots: asyncio.Semaphore,
+                     rate: Optional[TokenBucket] = None) -> bool:
+    """Whether a TCP connect to ``host:port`` completes within ``timeout`` seconds"""
+    loop = asyncio.get_running_loop()
+    async with slots:
+        if rate is not None:
+            await rate.take()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        # Close with RST so thousands of probes do not leave TIME_WAIT entries
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            sock.close()
+
+
+def connect_slots(concurrency: int = TCP_PROBE_CONCURRENCY) -> asyncio.Semaphore:
+    """Semaphore bounding connects in flight, within the descriptor budget"""
+    return asyncio.Semaphore(_fd_budget(concurrency))
+
+
+async def probe_host(host: str, ports: Iterable[int], timeout: float, slots: asyncio.Semaphore,
+                     rate: Optional[TokenBucket] = None) -> List[int]:
+    """Ports of ``host`` that accepted a connect, probed concurrently"""
+    ports = list(ports)
+    answered = await asyncio.gather(*(probe_port(host, port, timeout, slots, rate) for port in ports))
+    return [port for port, ok in zip(ports, answered) if ok]
+
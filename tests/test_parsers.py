@@ -0,0 +1,76 @@
+"""
+Netlink and /proc/net/arp parsers against captured kernel output
+
+The fixtures were captured on a host with lo (index 1), two down ifb links
+and eth0 (index 4, 192.0.2.2/24), after priming 192.0.2.1 (answers) and
+192.0.2.77 (does not).
+"""
+
+from pathlib import Path
+
+import interfaces
+import neighbors
+import netlink
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+IFNAMES = {1: 'lo', 2: 'ifb0', 3: 'ifb1', 4: 'eth0'}
+
+
+def _fixture(name: str) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+
+def test_iter_messages_stops_at_truncated_message():
+    data = _fixture('rtm_getaddr.bin')
+    complete = list(netlink.iter_messages(data))
+    assert complete[-1][0] == netlink.NLMSG_DONE
+    assert len(list(netlink.iter_messages(data[:-8]))) == len(complete) - 1
+
+
+def test_parse_neigh_messages():
+    found = {n.ip_address: n for n in neighbors.parse_neigh_messages([_fixture('rtm_getneigh.bin')], IFNAMES)}
+    assert found['192.0.2.1'] == neighbors.Neighbor('192.0.2.1', '02:fc:00:00:00:05', 'eth0', neighbors.NUD_REACHABLE)
+    unresolved = found['192.0.2.77']
+    assert unresolved.mac_address is None
+    assert unresolved.state == neighbors.NUD_INCOMPLETE
+    assert found['0.0.0.0'].state == neighbors.NUD_NOARP
+
+
+def test_parse_neigh_messages_ignores_other_message_types():
+    assert neighbors.parse_neigh_messages([_fixture('rtm_getaddr.bin')], IFNAMES) == []
+
+
+def test_parse_proc_net_arp():
+    found = neighbors.parse_proc_net_arp((FIXTURES / 'proc_net_arp.txt').read_text())
+    assert found == [
+        neighbors.Neighbor('192.0.2.77', None, 'eth0', neighbors.NUD_INCOMPLETE),
+        neighbors.Neighbor('192.0.2.1', '02:fc:00:00:00:05', 'eth0', neighbors.NUD_REACHABLE),
+    ]
+
+
+def test_parse_proc_net_arp_permanent_and_malformed_lines():
+    text = ("IP address       HW type     Flags       HW address            Mask     Device\n"
+            "10.0.0.1         0x1         0x6         AA:BB:CC:DD:EE:FF     *        br0\n"
+            "10.0.0.2         0x1         bogus       00:00:00:00:00:00     *        br0\n"
+            "short line\n")
+    assert neighbors.parse_proc_net_arp(text) == [
+        neighbors.Neighbor('10.0.0.1', 'aa:bb:cc:dd:ee:ff', 'br0', neighbors.NUD_PERMANENT),
+    ]
+
+
+def test_parse_link_messages():
+    links = interfaces.parse_link_messages([_fixture('rtm_getlink.bin')])
+    assert {index: name for index, (name, _) in links.items()} == IFNAMES
+    assert links[1][1] & interfaces.IFF_LOOPBACK
+    assert links[4][1] & interfaces.IFF_UP
+    assert not links[2][1] & interfaces.IFF_UP
+
+
+def test_parse_addr_messages_skips_loopback():
+    links = interfaces.parse_link_messages([_fixture('rtm_getlink.bin')])
+    addresses = interfaces.parse_addr_messages([_fixture('rtm_getaddr.bin')], links)
+    assert addresses == [interfaces.Address('eth0', '192.0.2.2', 24)]
+
+
+def test_parse_addr_messages_skips_unknown_links():
+    assert interfaces.parse_addr_messages([_fixture('rtm_getaddr.bin')], {}) == []
@@ -0,0 +1,89 @@
+"""
+TCP prober against real loopback sockets: open, closed and filtered ports
+"""
+
+import asyncio
+import socket
+import time
+
+import pytest
+
+import tcp_probe
+
+
+@pytest.fixture
+def open_port():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    yield listener.getsockname()[1]
+    listener.close()
+
+
+@pytest.fixture
+def closed_port():
+    # Bound but not listening: the port stays reserved and connects are refused
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+@pytest.fixture
+def filtered_port():
+    # A listener whose accept queue is full drops further SYNs, which looks
+    # like a firewall that drops rather than rejects
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(0)
+    port = listener.getsockname()[1]
+    backlog = []
+    for _ in range(4):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            sock.connect(('127.0.0.1', port))
+        except BlockingIOError:
+            pass
+        backlog.append(sock)
+    time.sleep(0.1)
+    yield port
+    for sock in backlog:
+        sock.close()
+    listener.close()
+
+
+def _probe(port: int, timeout: float = 0.5) -> bool:
+    async def run():
+        return await tcp_probe.probe_port('127.0.0.1', port, timeout, tcp_probe.connect_slots(8))
+    return asyncio.run(run())
+
+
+def test_open_port(open_port):
+    assert _probe(open_port)
+
+
+def test_closed_port_is_refused_quickly(closed_port):
+    start = time.monotonic()
+    assert not _probe(closed_port, timeout=2)
+    assert time.monotonic() - start < 1
+
+
+def test_filtered_port_times_out(filtered_port):
+    start = time.monotonic()
+    assert not _probe(filtered_port, timeout=0.3)
+    assert time.monotonic() - start >= 0.25
+
+
+def test_probe_host_reports_only_open_ports(open_port, closed_port):
+    async def run():
+        return await tcp_probe.probe_host('127.0.0.1', [closed_port, open_port], 0.5, tcp_probe.connect_slots(8))
+    assert asyncio.run(run()) == [open_port]
+
+
+@pytest.mark.skipif(tcp_probe.resource is None, reason="no RLIMIT_NOFILE on this platform")
+def test_concurrency_is_clamped_to_descriptor_limit():
+    soft, _ = tcp_probe.resource.getrlimit(tcp_probe.resource.RLIMIT_NOFILE)
+    if soft == tcp_probe.resource.RLIM_INFINITY:
+        pytest.skip("no descriptor limit")
+    assert tcp_probe._fd_budget(soft * 2) == max(1, soft - tcp_probe._FD_HEADROOM)